@@ -4,99 +4,616 @@
 網頁截圖工具 - 增強版，支援範圍截圖功能
 """
 
-import argparse
+import atexit
+import logging
+import logging.handlers
 import sys
 import os
 import time
 import io
-from urllib.parse import urlparse
+import base64
+import concurrent.futures
+import functools
+import json
+import multiprocessing
+import multiprocessing.util
+import re
+import shutil
+import socket
+import tempfile
+import threading
 
-# Windows 編碼修正
-if sys.platform.startswith('win'):
+log = logging.getLogger("screenshot")
+
+# Selenium、Pillow 與 pyvips 於第一次建立 WebScreenshotTool 時才載入（load_dependencies），
+# --help、--version 與參數錯誤不必付出載入這些套件的時間
+webdriver = Service = Options = By = WebDriverWait = EC = Keys = Image = pyvips = None
+
+def load_dependencies():
+    """載入 Selenium 與 Pillow（以及選用的 pyvips）；已載入時直接返回，缺少必要套件時印出安裝說明並結束"""
+    global webdriver, Service, Options, By, WebDriverWait, EC, Keys, Image, pyvips
+    if Image is not None:
+        return
+    
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.common.keys import Keys
+    except ImportError:
+        print("Error: Missing required packages. Please install:")
+        print("pip install selenium>=4.15.0")
+        sys.exit(1)
+    
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Error: Missing Pillow package. Please install:")
+        print("pip install pillow")
+        sys.exit(1)
+    
+    # 選用：有安裝 pyvips 時 JPEG 編碼改走 libvips（串流處理 + libjpeg-turbo）
+    try:
+        import pyvips
+    except (ImportError, OSError):
+        pyvips = None
+
+VERSION = '2.2.0'
+
+# --version 輸出；main() 只有 --version 一個參數時直接印出，不建立 argparse 解析器
+VERSION_STRING = f"WebScreenshot v{VERSION}"
+
+# 固定的橫幅與分隔線字串，載入時建立一次
+BANNER = f"=== Web Screenshot Tool v{VERSION} ==="
+SEPARATOR = "-" * 60
+
+DEFAULT_DAEMON_ADDRESS = '127.0.0.1:9520'
+
+# daemon 接受的工作欄位（capture_screenshot 的參數），其餘欄位一律拒絕
+DAEMON_JOB_KEYS = frozenset((
+    'url', 'output_path', 'width', 'height', 'full_page', 'wait_time', 'quality', 'username', 'password',
+    'start_height', 'end_height', 'dpi', 'element', 'settle_time',
+))
+
+# daemon 等待客戶端送出工作與接收回覆的秒數，避免單一連線卡住整個 daemon
+DAEMON_CLIENT_TIMEOUT = 30
+
+# 高解析度預設：(視窗寬, 視窗高, DPI)，維持 1080p 桌面版面，以縮放倍數提高輸出解析度
+PRESETS = {
+    '2k': (1920, 1080, 4 / 3),   # 輸出 2560x1440
+    '4k': (1920, 1080, 2.0),     # 輸出 3840x2160
+    '8k': (1920, 1080, 4.0),     # 輸出 7680x4320
+}
+
+# 判斷輸入是否已帶協定（scheme://），以及是否含空白
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s')
+
+# 程式所在目錄與 ChromeDriver 候選路徑，__file__ 不會變動，載入時計算一次
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHROMEDRIVER_CANDIDATES = (
+    os.path.join(SCRIPT_DIR, "chromedriver.exe"),
+    os.path.join(SCRIPT_DIR, "chromedriver"),
+    "chromedriver.exe",
+    "chromedriver"
+)
+
+# Grafana 登入表單選擇器：以 CSS 群組選擇器合併，一次往返即可找到欄位
+GRAFANA_USERNAME_SELECTORS = ", ".join([
+    "input[placeholder='email or username']",
+    "input[aria-label='Username input field']",
+    "input[name='user']",
+    "input[name='username']",
+    "input[type='text']"
+])
+
+GRAFANA_PASSWORD_SELECTORS = ", ".join([
+    "input[placeholder='password']",
+    "input[type='password']",
+    "input[name='password']"
+])
+
+GRAFANA_BUTTON_SELECTORS = ", ".join([
+    "button[type='submit']",
+    "button[aria-label='Login button']",
+    "input[type='submit']"
+])
+
+# OpenShift 登入表單選擇器：依優先順序排列，交給瀏覽器內一次比對
+OPENSHIFT_USERNAME_SELECTORS = (
+    "input[id='inputUsername']",
+    "input[name='username']",
+    "input[name='inputUsername']",
+    "input[placeholder*='用户']",
+    "input[placeholder*='username']",
+    "input[placeholder*='User']",
+    "input[name='user']",
+    "input[type='text']",
+    ".pf-c-form-control[type='text']"
+)
+
+OPENSHIFT_PASSWORD_SELECTORS = (
+    "input[id='inputPassword']",
+    "input[name='password']",
+    "input[name='inputPassword']",
+    "input[placeholder*='密码']",
+    "input[placeholder*='password']",
+    "input[placeholder*='Password']",
+    "input[type='password']",
+    ".pf-c-form-control[type='password']"
+)
+
+OPENSHIFT_BUTTON_SELECTORS = (
+    "button[type='submit']",
+    "input[type='submit']",
+    ".pf-c-button[type='submit']",
+    "button.pf-c-button.pf-m-primary",
+    "button.pf-m-block[type='submit']"
+)
+
+# 選擇器都找不到時，依按鈕文字尋找登入按鈕
+LOGIN_BUTTON_TEXTS = ('登录', 'Login', '登錄', 'Log in')
+
+# 通用登入表單選擇器
+GENERIC_USERNAME_SELECTORS = (
+    "input[name='username']",
+    "input[name='user']",
+    "input[name='email']",
+    "input[type='text']",
+    "input[type='email']"
+)
+
+GENERIC_PASSWORD_SELECTORS = ("input[type='password']",)
+
+GENERIC_BUTTON_SELECTORS = ("button[type='submit']", "input[type='submit']")
+
+# 登入頁已可操作：載入完成且出現帳號或密碼欄位
+LOGIN_FORM_READY_JS = "document.readyState === 'complete' && !!document.querySelector('input[type=password], input[name*=user i]')"
+
+# 依序比對選擇器並填入第一個符合的欄位，回傳命中的選擇器
+FIND_AND_FILL_JS = """
+    for (const s of arguments[0]) {
+        const e = document.querySelector(s);
+        if (!e) continue;
+        const setValue = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(e), 'value').set;
+        e.focus();
+        setValue.call(e, arguments[1]);
+        e.dispatchEvent(new Event('input', {bubbles: true}));
+        e.dispatchEvent(new Event('change', {bubbles: true}));
+        return s;
+    }
+    return null;
+"""
+
+# 登入頁/登入結果偵測：在瀏覽器內以頁面文字比對，不必傳回整份 page_source
+LOGIN_PROBE_JS = """
+    const s = ((document.body && document.body.innerText) || '').toLowerCase();
+    const t = (document.title || '').toLowerCase();
+    return {
+        url: location.href,
+        grafana: s.includes('grafana') || t.includes('grafana') || !!window.grafanaBootData,
+        grafanaWelcome: s.includes('welcome to grafana'),
+        openshift: /openshift|red hat/.test(s + ' ' + t),
+        openshiftOk: /projects|logout|sign out|openshift console/.test(s) ||
+                     (s.includes('welcome') && s.includes('openshift')),
+        err: /invalid|error|incorrect|failed|unauthorized|错误|失败/.test(s)
+    };
+"""
+
+# 於每個新文件預先定義 window.__pickField，之後比對欄位只需傳送短短的呼叫與選擇器
+PICK_FIELD_JS = "window.__pickField = function () {" + FIND_AND_FILL_JS + "};"
+
+# 呼叫頁面內的 __pickField；尚未定義（注入前已載入的頁面）時回傳 false 由 Python 改送完整腳本
+CALL_PICK_FIELD_JS = "return window.__pickField ? window.__pickField(arguments[0], arguments[1]) : false;"
+
+# 依序比對選擇器，再依按鈕文字尋找登入按鈕並點擊
+CLICK_SUBMIT_JS = """
+    for (const s of arguments[0]) {
+        const e = document.querySelector(s);
+        if (e) { e.click(); return s; }
+    }
+    for (const b of document.querySelectorAll('button')) {
+        if (arguments[1].some(t => b.textContent.includes(t))) {
+            b.click();
+            return 'text: ' + b.textContent.trim();
+        }
+    }
+    return null;
+"""
+
+# 於每個新文件預先包裝 fetch/XHR，以 window.__inflight 計算進行中的請求
+# （Resource Timing 只在請求完成後才新增項目，無法用來判斷尚未完成的請求）
+INFLIGHT_COUNTER_JS = """
+(() => {
+    if (window.__inflight !== undefined) return;
+    window.__inflight = 0;
+    const done = () => { window.__inflight--; };
+    const fetch = window.fetch;
+    if (fetch) {
+        window.fetch = function () {
+            window.__inflight++;
+            return fetch.apply(this, arguments).finally(done);
+        };
+    }
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__inflight++;
+        this.addEventListener('loadend', done, {once: true});
+        try {
+            return send.apply(this, arguments);
+        } catch (e) {
+            this.removeEventListener('loadend', done);
+            done();
+            throw e;
+        }
+    };
+})();
+"""
+
+# 輪詢用的腳本固定為模組常數，每次輪詢送出相同的原始碼，V8 可沿用已編譯的結果
+# 載入狀態：[readyState, 進行中的 fetch/XHR 數]；計數器未注入的頁面視為 0
+READY_STATE_JS = """
+    return [document.readyState, Math.max(window.__inflight || 0, 0)];
+"""
+
+# 頁面穩定度：[進行中的 fetch/XHR 數, 已完成的資源數, 頁面高度]
+SETTLED_PROBE_JS = """
+    return [
+        Math.max(window.__inflight || 0, 0),
+        performance.getEntriesByType('resource').length,
+        document.documentElement.scrollHeight
+    ];
+"""
+
+# 一次取得 readyState 與頁面/視窗尺寸（CSS px）；scrollWidth/scrollHeight 已涵蓋 offset/client 尺寸，只需比較三項
+PAGE_DIMS_JS = """
+    const d = document, b = d.body, e = d.documentElement;
+    return {
+        ready: d.readyState,
+        w: Math.max(b.scrollWidth, e.scrollWidth, e.clientWidth),
+        h: Math.max(b.scrollHeight, e.scrollHeight, e.clientHeight),
+        cw: e.clientWidth,
+        vw: window.innerWidth,
+        vh: window.innerHeight,
+        dpr: window.devicePixelRatio
+    };
+"""
+
+# 捲動到指定位置並等待兩個 animation frame（捲動後的畫面已繪製）才返回實際的捲動位置；
+# 接近頁尾時瀏覽器會把捲動限制在 頁面高度 - 視窗高度，回傳值可能小於要求的位置。execute_script 會等待 Promise 完成
+SCROLL_AND_WAIT_FRAME_JS = """
+    window.scrollTo(0, arguments[0]);
+    return new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(
+        () => resolve(Math.round(window.scrollY)))));
+"""
+
+# 固定不變的 Chrome 啟動參數，只需建立一次；隨呼叫變動的參數（視窗大小等）於 setup_driver 另加
+# 精簡的 headless 參數：關閉背景網路/背景節流等與截圖無關的工作，停用的功能合併為單一 --disable-features
+BASE_CHROME_ARGS = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-web-security",
+    "--disable-blink-features=AutomationControlled",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "--disable-background-networking",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-ipc-flooding-protection",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+    "--hide-scrollbars",
+    "--ignore-certificate-errors"
+)
+
+# 高解析度截圖的點陣化參數：改走 ANGLE/GPU raster，由 ANGLE 自行選擇可用的後端
+GPU_RASTER_CHROME_ARGS = (
+    "--use-gl=angle",
+    "--enable-gpu-rasterization",
+    "--enable-zero-copy"
+)
+
+# 僅供沒有 GPU 的主機選用（--swiftshader）：強制 ANGLE 使用軟體模擬的 SwiftShader
+SWIFTSHADER_CHROME_ARGS = (
+    "--use-angle=swiftshader",
+    "--enable-unsafe-swiftshader"
+)
+
+# --block-default 的預設封鎖清單：分析、追蹤、頭像與 source map
+DEFAULT_BLOCK_PATTERNS = [
+    '*.googletagmanager.com/*',
+    '*.google-analytics.com/*',
+    '*gravatar.com/*',
+    '*/sockjs-node/*',
+    '*.map',
+    '*segment.io/*'
+]
+
+# 登入流程只需要表單 DOM：登入期間額外封鎖圖片與字型，登入頁更早載入完成
+LOGIN_BLOCK_PATTERNS = (
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf'
+)
+
+def setup_logging(level=logging.INFO):
+    """設定日誌輸出：統一以 UTF-8 寫到 stdout，無法編碼的字元以 ? 取代"""
+    stream = sys.stdout
     try:
-        sys.stdout.reconfigure(encoding='utf-8')
-        sys.stderr.reconfigure(encoding='utf-8')
-    except:
-        import codecs
-        sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
-        sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
-
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.common.keys import Keys
-except ImportError:
-    print("Error: Missing required packages. Please install:")
-    print("pip install selenium>=4.15.0")
-    sys.exit(1)
-
-try:
-    from PIL import Image
-except ImportError:
-    print("Error: Missing Pillow package. Please install:")
-    print("pip install pillow")
-    sys.exit(1)
-
-def safe_print(message):
-    """安全的 print 函數"""
+        stream.reconfigure(encoding='utf-8', errors='replace', line_buffering=True)
+    except (AttributeError, ValueError):
+        # 無法重新設定時才包一層以 ? 取代的編碼器，之後每行日誌都不必再處理編碼錯誤
+        if hasattr(stream, 'buffer'):
+            stream = io.TextIOWrapper(stream.buffer, encoding=getattr(stream, 'encoding', None) or 'ascii',
+                                      errors='replace', line_buffering=True)
+    
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(handler)
+    log.setLevel(level)
+
+def write_bytes(path, data):
+    """以原始 fd 寫檔（不經過 Python 緩衝），寫完後請系統釋放該檔的 page cache；回傳寫入的位元組數"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
     try:
-        print(message)
-    except UnicodeEncodeError:
-        ascii_message = message.encode('ascii', 'replace').decode('ascii')
-        print(ascii_message)
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        
+        # posix_fadvise 僅 POSIX 平台提供；DONTNEED 只會丟棄已落盤的頁面，因此先 fdatasync
+        if hasattr(os, 'posix_fadvise'):
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return len(data)
+
+def normalize_url(raw):
+    """以單次 urlsplit 正規化 URL：缺少協定時補上 https://；不是 http(s)、沒有主機名稱或格式錯誤
+    （例如未閉合的 IPv6 位址、超出範圍的連接埠）時回傳 None"""
+    from urllib.parse import urlsplit, urlunsplit
+    if WHITESPACE_RE.search(raw):
+        return None
+    try:
+        parts = urlsplit(raw if SCHEME_RE.match(raw) else 'https://' + raw)
+        # hostname/port 於存取時才解析，格式錯誤同樣以 ValueError 回報
+        if parts.scheme.lower() not in ('http', 'https') or not parts.hostname:
+            return None
+        parts.port
+    except ValueError:
+        return None
+    return urlunsplit(parts)
+
+def base_url_of(url):
+    """取得網址的 scheme://host[:port]，作為登入頁等網址的基底"""
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+@functools.lru_cache(maxsize=1)
+def _find_chromedriver():
+    """尋找 ChromeDriver（結果快取，同一程序只檢查一次）"""
+    for path in CHROMEDRIVER_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+# 單次 CDP 截圖的高度上限（CSS px）；更高的範圍改用分段截圖拼接
+MAX_CAPTURE_HEIGHT = 20000
+
+# 分段拼接輸出的高度上限（裝置像素）：JPEG 最大只能 65500px，PNG 則限制畫布記憶體
+MAX_STITCHED_JPEG_HEIGHT = 65500
+MAX_STITCHED_PNG_HEIGHT = 100000
+
+# --optimize 的 Huffman 最佳化只對此像素數以下的影像執行：大圖多一趟編碼的時間遠超過省下的幾個百分比
+MAX_OPTIMIZE_PIXELS = 4_000_000
+
+# 保留供重複使用的拼接畫布上限（高解析度整頁畫布每張可達數百 MB）
+MAX_IDLE_CANVASES = 2
 
 class WebScreenshotTool:
-    def __init__(self, chromedriver_path=None):
+    def __init__(self, chromedriver_path=None, page_load_timeout=30, no_images=False, wait_jquery=False,
+                 profile_dir=None, optimize_jpeg=False, max_driver_runs=50, block_patterns=None,
+                 gpu_raster=False, max_output_width=None, debug=False, tmpfs_profile=False, swiftshader=False,
+                 stitch_segments=False):
+        load_dependencies()
         self.chromedriver_path = chromedriver_path or self.find_chromedriver()
+        self.page_load_timeout = page_load_timeout
+        self.no_images = no_images
+        self.wait_jquery = wait_jquery
+        self.profile_dir = os.path.abspath(os.path.expanduser(profile_dir)) if profile_dir else None
+        self.optimize_jpeg = optimize_jpeg
+        self.block_patterns = list(block_patterns) if block_patterns else []
+        self.gpu_raster = gpu_raster or swiftshader
+        self.swiftshader = swiftshader
+        self.max_output_width = max_output_width
+        self.debug = debug
+        # 範圍截圖一律使用捲動 + 分段拼接（不支援 captureBeyondViewport 的 driver 使用）
+        self.stitch_segments = stitch_segments
+        
+        # 暫存 profile 放在 tmpfs（/dev/shm），Chrome 初始化 profile 與快取只碰記憶體；
+        # 依 driver 快取鍵各建一個目錄，driver 重新啟動時沿用已暖機的 profile
+        self.tmpfs_profile = tmpfs_profile and not self.profile_dir and os.path.isdir('/dev/shm')
+        self._tmpfs_dirs = {}
+        
+        # 依 (width, height, headless, dpi) 快取 driver，多次截圖共用同一個 Chrome
+        self.max_driver_runs = max_driver_runs
+        self._driver_cache = {}
+        self._runs_per_driver = {}
+        
+        # 寫檔與影像編碼交給背景執行緒，瀏覽器可同時處理下一張截圖
+        # PIL/libvips 的影像運算與檔案 I/O 皆會釋放 GIL，執行緒即足夠
+        self._encode_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._pending_writes = []
+        
+        # 依尺寸保留閒置的拼接畫布，連續分段截圖時不必每次重新配置
+        self._canvas_pool = {}
+        # 畫布池會被解碼執行緒、編碼完成的 callback 與 capture_many 的工作執行緒同時存取
+        self._canvas_lock = threading.Lock()
+        
+        # 已註冊登入輔助腳本的 driver session
+        self._helper_sessions = set()
+        atexit.register(self.close_all)
+    
+    def _get_or_create_driver(self, key):
+        """取得快取的 driver；使用次數達上限時重新啟動，避免 Chrome 長時間執行累積記憶體
+
+        回傳 (driver, reused)，reused 表示此 driver 先前已執行過截圖。
+        """
+        driver = self._driver_cache.get(key)
+        if driver is not None and self._runs_per_driver[key] >= self.max_driver_runs:
+            log.info(f"Recycling Chrome after {self._runs_per_driver[key]} screenshots")
+            self.discard_driver(key)
+            driver = None
+        
+        if driver is None:
+            log.info("Starting Chrome browser...")
+            driver = self.setup_driver(*key)
+            if not driver:
+                return None, False
+            self._driver_cache[key] = driver
+            self._runs_per_driver[key] = 0
+        
+        reused = self._runs_per_driver[key] > 0
+        self._runs_per_driver[key] += 1
+        return driver, reused
+    
+    def discard_driver(self, key):
+        """關閉並移除快取中的 driver"""
+        driver = self._driver_cache.pop(key, None)
+        self._runs_per_driver.pop(key, None)
+        if driver:
+            self._helper_sessions.discard(driver.session_id)
+            try:
+                driver.quit()
+            except:
+                pass
+    
+    def _write_output(self, output_path, func, *args, **kwargs):
+        """將輸出檔的編碼/寫入排入背景執行緒，結果由 wait_for_writes() 收集"""
+        future = self._encode_pool.submit(func, *args, **kwargs)
+        self._pending_writes.append((output_path, future))
+        return future
+    
+    def _acquire_canvas(self, size):
+        """取得拼接用的 RGB 畫布：有相同尺寸的閒置畫布就沿用，否則新建"""
+        with self._canvas_lock:
+            idle = self._canvas_pool.get(size)
+            if idle:
+                return idle.pop()
+        return Image.new('RGB', size, (255, 255, 255))
+    
+    def _release_canvas(self, image):
+        """歸還畫布供之後相同尺寸的截圖沿用；閒置畫布數量有上限，避免佔用過多記憶體"""
+        with self._canvas_lock:
+            if sum(len(idle) for idle in self._canvas_pool.values()) < MAX_IDLE_CANVASES:
+                self._canvas_pool.setdefault(image.size, []).append(image)
+    
+    def wait_for_writes(self):
+        """等待所有排入的寫檔完成，回傳寫入失敗的輸出路徑列表"""
+        failed = []
+        pending, self._pending_writes = self._pending_writes, []
+        for output_path, future in pending:
+            try:
+                # 寫檔函式回傳位元組數，不需再 stat 輸出檔
+                nbytes = future.result()
+                log.info(f"File size: {nbytes / 1024 / 1024:.2f} MB ({output_path})")
+            except Exception as e:
+                log.error(f"Save screenshot failed: {output_path}: {e}", exc_info=self.debug)
+                failed.append(output_path)
+        return failed
+    
+    def close_all(self):
+        """等待背景寫檔完成並關閉所有快取的 driver，移除 tmpfs 上的暫存 profile"""
+        self.wait_for_writes()
+        for key in list(self._driver_cache):
+            self.discard_driver(key)
+        for path in self._tmpfs_dirs.values():
+            shutil.rmtree(path, ignore_errors=True)
+        self._tmpfs_dirs.clear()
+    
+    def _tmpfs_profile_dir(self, key):
+        """取得（必要時建立）此 driver 快取鍵專用的 tmpfs profile 目錄"""
+        path = self._tmpfs_dirs.get(key)
+        if path is None:
+            path = tempfile.mkdtemp(prefix=f"screenshot-prof-{os.getpid()}-", dir='/dev/shm')
+            self._tmpfs_dirs[key] = path
+        return path
+    
+    def close(self):
+        """明確結束：關閉所有 driver 並停止背景寫檔執行緒，之後此物件不可再使用
+
+        同時取消 atexit 的 close_all，否則 atexit 持有的參照會讓工具（含畫布池與 driver 快取）存活到程式結束。
+        """
+        atexit.unregister(self.close_all)
+        self.close_all()
+        self._encode_pool.shutdown(wait=True)
+    
+    def reset_driver(self, driver):
+        """沿用 driver 前清除上一次截圖留下的狀態：先回到空白頁，未使用持久化 profile 時一併清除 cookie
+
+        WebDriver 的 delete_all_cookies 只刪除目前文件可見的 cookie，about:blank 沒有來源，
+        因此改以 CDP 清除整個瀏覽器的 cookie。
+        """
+        try:
+            driver.get("about:blank")
+            if not self.profile_dir:
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception as e:
+            log.debug("Failed to reset browser state: %s", e)
     
     def find_chromedriver(self):
         """尋找 ChromeDriver"""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        possible_paths = [
-            os.path.join(current_dir, "chromedriver.exe"),
-            os.path.join(current_dir, "chromedriver"),
-            "chromedriver.exe",
-            "chromedriver"
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                return path
-        return None
+        return _find_chromedriver()
     
-    def setup_driver(self, width=1920, height=1080, headless=True):
+    def setup_driver(self, width=1920, height=1080, headless=True, dpi=1.0):
         """設定 WebDriver"""
         chrome_options = Options()
         
         if headless:
             chrome_options.add_argument("--headless=new")
         
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--disable-web-security")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--disable-extensions")
+        for arg in BASE_CHROME_ARGS:
+            chrome_options.add_argument(arg)
         chrome_options.add_argument(f"--window-size={width},{height}")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+        if dpi != 1.0:
+            # 由 Chrome 原生的裝置縮放倍數渲染，第一次繪製即為目標解析度
+            chrome_options.add_argument(f"--force-device-scale-factor={dpi}")
+        
+        if self.gpu_raster:
+            for arg in GPU_RASTER_CHROME_ARGS:
+                chrome_options.add_argument(arg)
+            if self.swiftshader:
+                for arg in SWIFTSHADER_CHROME_ARGS:
+                    chrome_options.add_argument(arg)
         
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         
-        chrome_options.add_argument("--ignore-certificate-errors")
-        chrome_options.add_argument("--ignore-ssl-errors")
+        if self.profile_dir:
+            # 持久化 profile，登入 cookie 可跨次執行沿用
+            chrome_options.add_argument(f"--user-data-dir={self.profile_dir}")
+        elif self.tmpfs_profile:
+            profile_dir = self._tmpfs_profile_dir((width, height, headless, dpi))
+            chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+            chrome_options.add_argument(f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}")
+        
+        if self.no_images:
+            # 不下載也不解碼圖片，適合只需要文字/版面的截圖
+            chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
         
         try:
-            if self.chromedriver_path and os.path.exists(self.chromedriver_path):
-                safe_print(f"Using local ChromeDriver: {self.chromedriver_path}")
+            if self.chromedriver_path:
+                log.info(f"Using local ChromeDriver: {self.chromedriver_path}")
                 service = Service(executable_path=self.chromedriver_path)
                 driver = webdriver.Chrome(service=service, options=chrome_options)
             else:
-                safe_print("Using system ChromeDriver")
+                log.info("Using system ChromeDriver")
                 driver = webdriver.Chrome(options=chrome_options)
             
             try:
@@ -104,455 +621,559 @@ class WebScreenshotTool:
             except:
                 pass
             
+            self.enlarge_connection_pool(driver)
+            self.install_request_counter(driver)
+            self.apply_url_blocking(driver)
+            
             return driver
             
         except Exception as e:
-            safe_print(f"Error: Unable to start Chrome browser: {e}")
+            log.error(f"Error: Unable to start Chrome browser: {e}", exc_info=self.debug)
             return None
     
+    def apply_url_blocking(self, driver, extra_patterns=(), reset=False):
+        """以 CDP 封鎖追蹤/分析等不影響畫面的資源（僅作用於目前分頁）
+
+        extra_patterns 為暫時追加的樣式（例如登入期間）；reset 為 True 時即使沒有任何樣式也會送出，
+        以清除先前追加的封鎖。
+        """
+        patterns = self.block_patterns + list(extra_patterns)
+        if not patterns and not reset:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except Exception as e:
+            log.warning(f"Failed to block URL patterns: {e}")
+    
+    def enlarge_connection_pool(self, driver, maxsize=10):
+        """擴大 WebDriver HTTP 連線池（預設只有 1 條），避免重疊指令互相等待"""
+        executor = driver.command_executor
+        try:
+            executor._client_config.init_args_for_pool_manager = {
+                "init_args_for_pool_manager": {"maxsize": maxsize}
+            }
+            old_conn = getattr(executor, '_conn', None)
+            executor._conn = executor._get_connection_manager()
+            if old_conn is not None:
+                old_conn.clear()
+        except Exception as e:
+            # 舊版 Selenium 沒有 ClientConfig，維持預設連線池
+            log.debug("Keep default WebDriver connection pool: %s", e)
+    
     def validate_url(self, url):
-        """驗證 URL"""
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
+        """驗證 URL，缺少協定時補上 https://；回傳正規化後的 URL，無效時回傳 None"""
+        return normalize_url(url)
+    
+    def _poll_ready(self, driver, timeout, interval=0.1):
+        """輪詢 readyState 與進行中的 fetch/XHR（INFLIGHT_COUNTER_JS），載入完成且沒有進行中的請求即返回"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ready_state, pending = driver.execute_script(READY_STATE_JS)
+                if ready_state == "complete" and pending == 0:
+                    return True
+            except:
+                pass
+            
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+    
+    def wait_until_js(self, driver, js_expr, timeout, poll=0.1):
+        """輪詢 JS 條件，成立即返回 True；逾時返回 False"""
+        script = f"return ({js_expr})"
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=poll).until(
+                lambda d: d.execute_script(script)
+            )
+            return True
+        except Exception:
+            return False
+    
+    def wait_for_settled(self, driver, timeout, poll=0.25):
+        """等待頁面穩定：沒有進行中的 fetch/XHR，且資源數與頁面高度連續兩次輪詢不變；timeout 為上限"""
+        state = {'last': None, 'stable': 0}
+        
+        def settled(d):
+            pending, resources, height = d.execute_script(SETTLED_PROBE_JS)
+            signature = (resources, height)
+            if pending == 0 and signature == state['last']:
+                state['stable'] += 1
+            else:
+                state['stable'] = 0
+            state['last'] = signature
+            return state['stable'] >= 2
         
         try:
-            result = urlparse(url)
-            return all([result.scheme, result.netloc])
-        except:
+            WebDriverWait(driver, timeout, poll_frequency=poll).until(settled)
+            return True
+        except Exception:
             return False
     
-    def wait_for_page_load(self, driver, timeout=30):
-        """等待頁面載入"""
+    def _open_devtools_socket(self, driver, timeout):
+        """開啟目前分頁的 DevTools websocket，回傳 (ws, target_id)；無法連線時回傳 (None, None)"""
         try:
-            WebDriverWait(driver, timeout).until(
-                lambda driver: driver.execute_script("return document.readyState") == "complete"
-            )
-            time.sleep(2)
+            import websocket
+            debugger_address = driver.capabilities['goog:chromeOptions']['debuggerAddress']
+            target_id = driver.current_window_handle
+            ws = websocket.create_connection(f"ws://{debugger_address}/devtools/page/{target_id}",
+                                             timeout=timeout, suppress_origin=True)
+            return ws, target_id
         except Exception as e:
-            safe_print(f"Page load timeout: {e}")
+            log.debug("CDP websocket unavailable, fall back to polling: %s", e)
+            return None, None
     
-    def grafana_login(self, driver, base_url, username, password):
-        """Grafana 專用登入處理"""
+    def devtools_command(self, driver, method, params=None, timeout=None):
+        """經 DevTools websocket 對目前分頁送出一個 CDP 指令並回傳結果
+
+        無法連線時回傳 None 由呼叫端改用 execute_cdp_cmd；指令本身失敗時拋出例外。
+        """
+        timeout = self.page_load_timeout if timeout is None else timeout
+        ws, _ = self._open_devtools_socket(driver, timeout)
+        if ws is None:
+            return None
         try:
-            login_url = f"{base_url.rstrip('/')}/login"
-            safe_print(f"正在存取 Grafana 登入頁面: {login_url}")
-            
-            driver.get(login_url)
-            time.sleep(3)
-            
-            # 尋找用戶名欄位
-            safe_print("尋找用戶名輸入欄位...")
-            username_input = None
-            
-            username_selectors = [
-                "input[placeholder='email or username']",
-                "input[aria-label='Username input field']",
-                "input[name='user']",
-                "input[name='username']",
-                "input[type='text']"
-            ]
-            
-            for selector in username_selectors:
-                try:
-                    username_input = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    safe_print(f"找到用戶名欄位: {selector}")
+            ws.send(json.dumps({"id": 1, "method": method, "params": params or {}}))
+            while True:
+                message = json.loads(ws.recv())
+                if message.get("id") == 1:
                     break
-                except:
-                    continue
-            
-            if not username_input:
-                safe_print("❌ 找不到用戶名輸入欄位")
+        except Exception as e:
+            log.debug("CDP websocket command failed, fall back to ChromeDriver: %s", e)
+            return None
+        finally:
+            try:
+                ws.close()
+            except:
+                pass
+        
+        if "error" in message:
+            raise RuntimeError(f"{method} failed: {message['error'].get('message')}")
+        return message["result"]
+    
+    def wait_for_network_quiet(self, driver, timeout):
+        """以 CDP 網路事件等待頁面請求全部完成，最後一個請求結束即返回
+
+        訂閱前已發出的請求無法追蹤，因此進行中的請求歸零時再以 performance entries 確認；
+        Page.lifecycleEvent 的 networkIdle 仍視為完成。無法連線時回傳 None，由呼叫端改用輪詢。
+        """
+        ws, target_id = self._open_devtools_socket(driver, timeout)
+        if ws is None:
+            return None
+        
+        import websocket
+        
+        def quiet():
+            try:
+                ready_state, pending = driver.execute_script(READY_STATE_JS)
+                return ready_state == "complete" and pending == 0
+            except Exception:
                 return False
+        
+        inflight = set()
+        subscribed = False
+        deadline = time.monotonic() + timeout
+        try:
+            ws.send(json.dumps({"id": 1, "method": "Network.enable"}))
+            ws.send(json.dumps({"id": 2, "method": "Page.enable"}))
+            ws.send(json.dumps({"id": 3, "method": "Page.setLifecycleEventsEnabled", "params": {"enabled": True}}))
             
-            # 尋找密碼欄位
-            safe_print("尋找密碼輸入欄位...")
-            password_input = None
-            
-            password_selectors = [
-                "input[placeholder='password']",
-                "input[type='password']",
-                "input[name='password']"
-            ]
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                ws.settimeout(remaining)
+                message = json.loads(ws.recv())
+                method = message.get("method")
+                
+                if message.get("id") == 3:
+                    # 訂閱完成：之後發出的請求都會收到事件
+                    subscribed = True
+                    if not inflight and quiet():
+                        return True
+                elif method == "Network.requestWillBeSent":
+                    # EventSource 等長連線不會結束，不列入等待
+                    if message["params"].get("type") != "EventSource":
+                        inflight.add(message["params"]["requestId"])
+                elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                    inflight.discard(message["params"]["requestId"])
+                    if subscribed and not inflight and quiet():
+                        return True
+                elif (method == "Page.lifecycleEvent" and
+                        message["params"].get("name") == "networkIdle" and
+                        message["params"].get("frameId") == target_id):
+                    return True
+        except websocket.WebSocketTimeoutException:
+            return False
+        except Exception as e:
+            log.warning(f"CDP network wait failed: {e}")
+            return None
+        finally:
+            try:
+                ws.close()
+            except:
+                pass
+    
+    def wait_for_lifecycle_event(self, driver, name, timeout):
+        """透過 DevTools websocket 訂閱 Page.lifecycleEvent，收到指定事件即返回
+
+        開啟 lifecycle 事件時 Chrome 會補送已發生的事件，因此在 driver.get 之後訂閱也不會漏接。
+        無法連線時回傳 None，由呼叫端改用輪詢。
+        """
+        ws, target_id = self._open_devtools_socket(driver, timeout)
+        if ws is None:
+            return None
+        
+        import websocket
+        deadline = time.monotonic() + timeout
+        try:
+            ws.send(json.dumps({"id": 1, "method": "Page.enable"}))
+            ws.send(json.dumps({"id": 2, "method": "Page.setLifecycleEventsEnabled", "params": {"enabled": True}}))
             
-            for selector in password_selectors:
-                try:
-                    password_input = driver.find_element(By.CSS_SELECTOR, selector)
-                    safe_print(f"找到密碼欄位: {selector}")
-                    break
-                except:
-                    continue
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                ws.settimeout(remaining)
+                message = json.loads(ws.recv())
+                if (message.get("method") == "Page.lifecycleEvent" and
+                        message["params"].get("name") == name and
+                        message["params"].get("frameId") == target_id):
+                    return True
+        except websocket.WebSocketTimeoutException:
+            return False
+        except Exception as e:
+            log.warning(f"CDP lifecycle wait failed: {e}")
+            return None
+        finally:
+            try:
+                ws.close()
+            except:
+                pass
+    
+    def wait_for_load(self, driver, timeout):
+        """等待 load 事件（DevTools 推送，不輪詢）；無法連線時改以輪詢 readyState"""
+        ready = self.wait_for_lifecycle_event(driver, "load", timeout)
+        if ready is None:
+            ready = self._poll_ready(driver, timeout)
+        return ready
+    
+    def wait_for_page_load(self, driver, timeout=None):
+        """等待頁面載入"""
+        timeout = self.page_load_timeout if timeout is None else timeout
+        ready = self.wait_for_network_quiet(driver, timeout)
+        if ready is None:
+            ready = self._poll_ready(driver, timeout)
+        if not ready:
+            log.warning(f"Page load timeout after {timeout} seconds")
+        
+        if self.wait_jquery:
+            # 偵測與等待合併在同一個腳本：頁面沒有 jQuery 時第一次就會成立
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                    lambda d: d.execute_script("return (typeof jQuery === 'undefined') || jQuery.active === 0")
+                )
+            except Exception as e:
+                log.warning(f"jQuery AJAX wait timeout: {e}")
+    
+    def install_request_counter(self, driver):
+        """於目前分頁註冊 INFLIGHT_COUNTER_JS，之後載入的文件都會計算進行中的 fetch/XHR"""
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INFLIGHT_COUNTER_JS})
+        except Exception as e:
+            log.debug("無法註冊請求計數腳本: %s", e)
+    
+    def install_login_helpers(self, driver):
+        """註冊登入輔助腳本，之後每個載入的文件都會先定義 window.__pickField（每個 driver 一次）"""
+        if driver.session_id in self._helper_sessions:
+            return
+        try:
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": PICK_FIELD_JS})
+            self._helper_sessions.add(driver.session_id)
+        except Exception as e:
+            log.debug("無法註冊登入輔助腳本: %s", e)
+    
+    def _js_find_and_fill(self, driver, selectors, value, is_password=False):
+        """在瀏覽器內依序比對選擇器，對第一個符合的欄位填值；回傳命中的選擇器或 None"""
+        selectors = list(selectors)
+        selector = driver.execute_script(CALL_PICK_FIELD_JS, selectors, value)
+        if selector is False:
+            selector = driver.execute_script(FIND_AND_FILL_JS, selectors, value)
+        if selector:
+            log.debug("找到%s欄位: %s", "密碼" if is_password else "用戶名", selector)
+        return selector
+    
+    def _js_click_submit(self, driver, selectors, texts=()):
+        """在瀏覽器內尋找並點擊登入按鈕（先比對選擇器，再比對按鈕文字）"""
+        matched = driver.execute_script(CLICK_SUBMIT_JS, list(selectors), list(texts))
+        if matched:
+            log.debug("找到登入按鈕: %s", matched)
+            log.info("點擊登入按鈕...")
+        return matched
+    
+    def grafana_login(self, driver, base_url, username, password, already_on_login=False):
+        """Grafana 專用登入處理；already_on_login 表示呼叫端已開啟登入頁，不再重新載入"""
+        try:
+            login_url = f"{base_url.rstrip('/')}/login"
+            if not already_on_login:
+                log.info(f"正在存取 Grafana 登入頁面: {login_url}")
+                driver.get(login_url)
+                self.wait_for_load(driver, self.page_load_timeout)
             
-            if not password_input:
-                safe_print("❌ 找不到密碼輸入欄位")
+            # 尋找並填入用戶名欄位：群組選擇器在瀏覽器內比對，找到即填值，每次輪詢一趟往返
+            log.debug("尋找用戶名輸入欄位...")
+            try:
+                WebDriverWait(driver, 10, poll_frequency=0.2).until(
+                    lambda d: self._js_find_and_fill(d, (GRAFANA_USERNAME_SELECTORS,), username)
+                )
+            except:
+                log.error("❌ 找不到用戶名輸入欄位")
                 return False
             
-            # 填入登入資訊
-            safe_print("填入登入認證...")
-            username_input.click()
-            username_input.clear()
-            username_input.send_keys(username)
-            
-            password_input.click()
-            password_input.clear()
-            password_input.send_keys(password)
+            # 尋找並填入密碼欄位
+            log.debug("尋找密碼輸入欄位...")
+            password_selector = self._js_find_and_fill(driver, (GRAFANA_PASSWORD_SELECTORS,), password, is_password=True)
+            if not password_selector:
+                log.error("❌ 找不到密碼輸入欄位")
+                return False
             
             # 尋找並點擊登入按鈕
-            safe_print("尋找登入按鈕...")
-            login_button = None
-            
-            button_selectors = [
-                "button[type='submit']",
-                "button[aria-label='Login button']",
-                "input[type='submit']"
-            ]
-            
-            for selector in button_selectors:
-                try:
-                    login_button = driver.find_element(By.CSS_SELECTOR, selector)
-                    safe_print(f"找到登入按鈕: {selector}")
-                    break
-                except:
-                    continue
-            
-            if login_button:
-                safe_print("點擊登入按鈕...")
-                login_button.click()
-            else:
-                safe_print("找不到登入按鈕，嘗試按 Enter 鍵...")
-                password_input.send_keys(Keys.RETURN)
-            
-            # 等待登入完成
-            safe_print("等待登入完成...")
-            time.sleep(5)
-            
-            # 檢查登入結果
-            current_url = driver.current_url
-            page_source = driver.page_source.lower()
+            log.debug("尋找登入按鈕...")
+            if not self._js_click_submit(driver, (GRAFANA_BUTTON_SELECTORS,)):
+                log.info("找不到登入按鈕，嘗試按 Enter 鍵...")
+                driver.find_element(By.CSS_SELECTOR, password_selector).send_keys(Keys.RETURN)
+            
+            # 等待登入完成：離開登入頁，或頁面出現錯誤訊息
+            log.info("等待登入完成...")
+            self.wait_until_js(driver, f"""
+                !location.href.startsWith({json.dumps(login_url)}) ||
+                !!document.querySelector('[data-testid="data-testid Alert error"], .alert-error, [role=alert]')
+            """, 15)
+            
+            # 檢查登入結果（一次 JS 探測取得網址與頁面指標）
+            probe = driver.execute_script(LOGIN_PROBE_JS)
+            current_url = probe['url']
             
             # 檢查是否登入成功
             if (login_url not in current_url or 
-                'welcome to grafana' in page_source or
+                probe['grafanaWelcome'] or
                 'dashboard' in current_url.lower() or
                 'home' in current_url.lower()):
-                safe_print("✅ Grafana 登入成功！")
+                log.info("✅ Grafana 登入成功！")
                 return True
             else:
                 # 檢查是否有錯誤訊息
-                error_indicators = ['invalid', 'error', 'incorrect', 'failed']
-                if any(indicator in page_source for indicator in error_indicators):
-                    safe_print("❌ 登入失敗：發現錯誤訊息")
+                if probe['err']:
+                    log.error("❌ 登入失敗：發現錯誤訊息")
                     return False
                 else:
-                    safe_print("⚠️ 登入狀態不明確，嘗試繼續...")
+                    log.warning("⚠️ 登入狀態不明確，嘗試繼續...")
                     return True
                 
         except Exception as e:
-            safe_print(f"❌ Grafana 登入失敗: {e}")
+            log.error(f"❌ Grafana 登入失敗: {e}", exc_info=self.debug)
             return False
     
-    def openshift_login(self, driver, base_url, username, password):
-        """OpenShift 專用登入處理"""
+    def openshift_login(self, driver, base_url, username, password, already_on_login=False):
+        """OpenShift 專用登入處理；already_on_login 表示呼叫端已開啟登入頁，不再重新載入"""
         try:
             login_url = f"{base_url.rstrip('/')}/login"
-            safe_print(f"正在存取 OpenShift 登入頁面: {login_url}")
-            
-            driver.get(login_url)
-            time.sleep(3)
-            
-            # 尋找用戶名欄位 - 根據你的截圖更新選擇器
-            safe_print("尋找用戶名輸入欄位...")
-            username_input = None
-            
-            username_selectors = [
-                "input[id='inputUsername']",  # 根據你的 HTML: id="inputUsername"
-                "input[name='username']",     # 根據你的 HTML: name="username"
-                "input[name='inputUsername']",
-                "input[placeholder*='用户']",
-                "input[placeholder*='username']",
-                "input[placeholder*='User']",
-                "input[name='user']",
-                "input[type='text']",
-                ".pf-c-form-control[type='text']"
-            ]
+            if not already_on_login:
+                log.info(f"正在存取 OpenShift 登入頁面: {login_url}")
+                driver.get(login_url)
+                self.wait_until_js(driver, LOGIN_FORM_READY_JS, 10)
             
-            for selector in username_selectors:
-                try:
-                    username_input = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    safe_print(f"找到用戶名欄位: {selector}")
-                    break
-                except:
-                    continue
-            
-            if not username_input:
-                safe_print("❌ 找不到用戶名輸入欄位")
+            # 尋找並填入用戶名欄位 - 所有選擇器在瀏覽器內一次比對
+            log.debug("尋找用戶名輸入欄位...")
+            try:
+                WebDriverWait(driver, 10, poll_frequency=0.2).until(
+                    lambda d: self._js_find_and_fill(d, OPENSHIFT_USERNAME_SELECTORS, username)
+                )
+            except:
+                log.error("❌ 找不到用戶名輸入欄位")
                 return False
             
-            # 尋找密碼欄位 - 根據你的截圖更新選擇器
-            safe_print("尋找密碼輸入欄位...")
-            password_input = None
-            
-            password_selectors = [
-                "input[id='inputPassword']",  # 根據你的 HTML: id="inputPassword"
-                "input[name='password']",     # 根據你的 HTML: name="password"
-                "input[name='inputPassword']",
-                "input[placeholder*='密码']",
-                "input[placeholder*='password']",
-                "input[placeholder*='Password']",
-                "input[type='password']",
-                ".pf-c-form-control[type='password']"
-            ]
-            
-            for selector in password_selectors:
-                try:
-                    password_input = driver.find_element(By.CSS_SELECTOR, selector)
-                    safe_print(f"找到密碼欄位: {selector}")
-                    break
-                except:
-                    continue
-            
-            if not password_input:
-                safe_print("❌ 找不到密碼輸入欄位")
+            # 尋找並填入密碼欄位 - 根據你的截圖更新選擇器
+            log.debug("尋找密碼輸入欄位...")
+            password_selector = self._js_find_and_fill(driver, OPENSHIFT_PASSWORD_SELECTORS, password, is_password=True)
+            if not password_selector:
+                log.error("❌ 找不到密碼輸入欄位")
                 return False
             
-            # 填入登入資訊
-            safe_print("填入登入認證...")
-            username_input.click()
-            username_input.clear()
-            time.sleep(0.5)
-            username_input.send_keys(username)
-            
-            password_input.click()
-            password_input.clear()
-            time.sleep(0.5)
-            password_input.send_keys(password)
-            
             # 尋找並點擊登入按鈕 - 根據你的 HTML 結構更新
-            safe_print("尋找登入按鈕...")
-            login_button = None
-            
-            # 根據你的 HTML，按鈕有 type="submit" 和文字"登录"
-            button_selectors = [
-                "button[type='submit']",  # 優先使用，因為你的按鈕是 type="submit"
-                "input[type='submit']",
-                ".pf-c-button[type='submit']",
-                "button.pf-c-button.pf-m-primary",
-                "button.pf-m-block[type='submit']"
-            ]
-            
-            for selector in button_selectors:
-                try:
-                    login_button = driver.find_element(By.CSS_SELECTOR, selector)
-                    safe_print(f"找到登入按鈕: {selector}")
-                    break
-                except:
-                    continue
-            
-            # 如果上面的選擇器都找不到，嘗試用文字內容找按鈕
-            if not login_button:
-                try:
-                    login_button = driver.find_element(By.XPATH, "//button[contains(text(), '登录')]")
-                    safe_print("找到登入按鈕: XPath 文字搜尋 '登录'")
-                except:
-                    try:
-                        # 嘗試其他可能的文字
-                        login_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Login') or contains(text(), '登錄') or contains(text(), 'Log in')]")
-                        safe_print("找到登入按鈕: XPath 文字搜尋")
-                    except:
-                        pass
-            
-            if login_button:
-                safe_print("點擊登入按鈕...")
-                login_button.click()
-            else:
-                safe_print("找不到登入按鈕，嘗試按 Enter 鍵...")
-                password_input.send_keys(Keys.RETURN)
-            
-            # 等待登入完成
-            safe_print("等待登入完成...")
-            time.sleep(8)
+            log.debug("尋找登入按鈕...")
+            
+            # 選擇器都找不到時，改用按鈕文字搜尋
+            if not self._js_click_submit(driver, OPENSHIFT_BUTTON_SELECTORS, LOGIN_BUTTON_TEXTS):
+                log.info("找不到登入按鈕，嘗試按 Enter 鍵...")
+                driver.find_element(By.CSS_SELECTOR, password_selector).send_keys(Keys.RETURN)
+            
+            # 等待登入完成：離開登入表單，或頁面出現錯誤訊息
+            log.info("等待登入完成...")
+            submitted_url = driver.current_url
+            self.wait_until_js(driver, f"""
+                (location.href !== {json.dumps(submitted_url)} &&
+                 !document.querySelector('.pf-c-login, input[type=password]')) ||
+                !!document.querySelector('.pf-c-alert.pf-m-danger, .pf-c-form__helper-text.pf-m-error')
+            """, 15)
             
             # 檢查登入結果
-            current_url = driver.current_url
-            page_source = driver.page_source.lower()
+            probe = driver.execute_script(LOGIN_PROBE_JS)
+            current_url = probe['url'].lower()
             
             # OpenShift 登入成功的指標
             success_indicators = [
-                'console' in current_url.lower(),
-                'dashboard' in current_url.lower(),
-                'overview' in current_url.lower(),
-                'projects' in page_source,
-                'logout' in page_source,
-                'sign out' in page_source,
-                'openshift console' in page_source,
-                'welcome' in page_source and 'openshift' in page_source
+                'console' in current_url,
+                'dashboard' in current_url,
+                'overview' in current_url,
+                probe['openshiftOk']
             ]
             
-            if any(success_indicators) or 'login' not in current_url.lower():
-                safe_print("✅ OpenShift 登入成功！")
+            if any(success_indicators) or 'login' not in current_url:
+                log.info("✅ OpenShift 登入成功！")
                 return True
             else:
-                error_indicators = ['invalid', 'error', 'incorrect', 'failed', 'unauthorized', '错误', '失败']
-                if any(indicator in page_source for indicator in error_indicators):
-                    safe_print("❌ 登入失敗：發現錯誤訊息")
+                if probe['err']:
+                    log.error("❌ 登入失敗：發現錯誤訊息")
                     return False
                 else:
-                    safe_print("⚠️ 登入狀態不明確，嘗試繼續...")
+                    log.warning("⚠️ 登入狀態不明確，嘗試繼續...")
                     return True
                 
         except Exception as e:
-            safe_print(f"❌ OpenShift 登入失敗: {e}")
+            log.error(f"❌ OpenShift 登入失敗: {e}", exc_info=self.debug)
             return False
     
     def auto_detect_login_type(self, driver, base_url, username, password):
         """自動偵測登入類型並處理"""
         try:
             test_url = f"{base_url.rstrip('/')}/login"
+            self.install_login_helpers(driver)
+            self.apply_url_blocking(driver, LOGIN_BLOCK_PATTERNS)
             driver.get(test_url)
-            time.sleep(3)
+            self.wait_until_js(driver, LOGIN_FORM_READY_JS, 10)
             
-            page_source = driver.page_source.lower()
-            current_url = driver.current_url.lower()
+            probe = driver.execute_script(LOGIN_PROBE_JS)
+            current_url = probe['url'].lower()
             
+            # 偵測到的登入頁已載入完成，交給對應的登入處理時不再重新載入
             # 偵測是否為 Grafana
-            if ('grafana' in page_source or 
-                'grafana' in current_url or 
-                'welcome to grafana' in page_source):
-                safe_print("🔍 偵測到 Grafana 系統")
-                return self.grafana_login(driver, base_url, username, password)
+            if probe['grafana'] or 'grafana' in current_url:
+                log.info("🔍 偵測到 Grafana 系統")
+                return self.grafana_login(driver, base_url, username, password, already_on_login=True)
             
             # 偵測是否為 OpenShift
-            elif ('openshift' in page_source or 
-                  'red hat' in page_source or 
+            elif (probe['openshift'] or
                   'openshift' in current_url or
                   'console-openshift' in current_url):
-                safe_print("🔍 偵測到 OpenShift 系統")
-                return self.openshift_login(driver, base_url, username, password)
+                log.info("🔍 偵測到 OpenShift 系統")
+                return self.openshift_login(driver, base_url, username, password, already_on_login=True)
             
             # 通用登入處理
             else:
-                safe_print("🔍 使用通用登入處理")
+                log.info("🔍 使用通用登入處理")
                 return self.generic_login(driver, username, password)
                 
         except Exception as e:
-            safe_print(f"❌ 自動偵測登入失敗: {e}")
+            log.error(f"❌ 自動偵測登入失敗: {e}", exc_info=self.debug)
             return False
+        finally:
+            # 還原為一般的封鎖清單，目標頁面的圖片與字型照常載入
+            self.apply_url_blocking(driver, reset=True)
     
     def generic_login(self, driver, username, password):
         """通用登入處理"""
         try:
-            safe_print("嘗試通用表單登入...")
-            
-            # 尋找用戶名欄位
-            username_selectors = [
-                "input[name='username']", 
-                "input[name='user']", 
-                "input[name='email']",
-                "input[type='text']", 
-                "input[type='email']"
-            ]
+            log.info("嘗試通用表單登入...")
             
-            username_input = None
-            for selector in username_selectors:
-                try:
-                    username_input = driver.find_element(By.CSS_SELECTOR, selector)
-                    break
-                except:
-                    continue
-            
-            # 尋找密碼欄位
-            password_input = None
-            try:
-                password_input = driver.find_element(By.CSS_SELECTOR, "input[type='password']")
-            except:
-                pass
+            # 尋找並填入用戶名/密碼欄位
+            if self._js_find_and_fill(driver, GENERIC_USERNAME_SELECTORS, username):
+                password_selector = self._js_find_and_fill(driver, GENERIC_PASSWORD_SELECTORS, password, is_password=True)
+            else:
+                password_selector = None
             
-            if username_input and password_input:
-                username_input.clear()
-                username_input.send_keys(username)
-                password_input.clear()
-                password_input.send_keys(password)
-                
+            if password_selector:
                 # 尋找提交按鈕
-                try:
-                    submit_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit'], input[type='submit']")
-                    submit_button.click()
-                except:
-                    password_input.send_keys(Keys.RETURN)
+                submitted_url = driver.current_url
+                if not self._js_click_submit(driver, GENERIC_BUTTON_SELECTORS):
+                    driver.find_element(By.CSS_SELECTOR, password_selector).send_keys(Keys.RETURN)
                 
-                time.sleep(5)
+                # 等待表單送出後離開登入頁（網址改變或密碼欄位消失）
+                self.wait_until_js(driver, f"""
+                    location.href !== {json.dumps(submitted_url)} ||
+                    !document.querySelector({json.dumps(password_selector)})
+                """, 15)
                 return True
             
             return False
             
         except Exception as e:
-            safe_print(f"通用登入失敗: {e}")
+            log.error(f"通用登入失敗: {e}", exc_info=self.debug)
             return False
     
-    def save_screenshot(self, screenshot_data, output_path, quality=95):
-        """保存截圖"""
-        try:
-            if output_path.lower().endswith('.png'):
-                with open(output_path, 'wb') as file:
-                    file.write(screenshot_data)
-            else:
-                image = Image.open(io.BytesIO(screenshot_data))
-                if image.mode in ('RGBA', 'LA'):
-                    background = Image.new('RGB', image.size, (255, 255, 255))
-                    background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                    image = background
-                
-                image.save(output_path, 'JPEG', quality=quality, optimize=True)
-        except Exception as e:
-            safe_print(f"Save screenshot failed: {e}")
-            raise
-        """保存截圖"""
+    def write_image(self, image, output_path, is_png, quality=85):
+        """將 PIL 影像編碼到記憶體後一次寫出，回傳檔案大小（位元組）"""
+        buffer = io.BytesIO()
+        if is_png:
+            image.save(buffer, 'PNG')
+        else:
+            self.save_jpeg(image, buffer, quality)
+        return write_bytes(output_path, buffer.getbuffer())
+    
+    def save_jpeg(self, image, output_path, quality=85):
+        """以 Pillow 編碼 JPEG：基準式（非漸進）、4:2:0 取樣，Huffman 最佳化僅在 --optimize 且影像不大時執行"""
+        optimize = self.optimize_jpeg and image.width * image.height < MAX_OPTIMIZE_PIXELS
+        image.save(output_path, 'JPEG', quality=quality, optimize=optimize,
+                   progressive=False, subsampling=2)
+    
+    def save_screenshot(self, screenshot_data, output_path, is_png, quality=85):
+        """保存 PNG 截圖資料（非 .png 輸出時轉為 JPEG），回傳檔案大小（位元組）"""
         try:
-            if output_path.lower().endswith('.png'):
-                with open(output_path, 'wb') as file:
-                    file.write(screenshot_data)
+            if is_png:
+                return write_bytes(output_path, screenshot_data)
+            elif pyvips is not None:
+                image = pyvips.Image.new_from_buffer(screenshot_data, '')
+                if image.hasalpha():
+                    image = image.flatten(background=[255, 255, 255])
+                optimize = self.optimize_jpeg and image.width * image.height < MAX_OPTIMIZE_PIXELS
+                return write_bytes(output_path, image.write_to_buffer(
+                    '.jpg', Q=quality, strip=True, optimize_coding=optimize))
             else:
+                # Chrome 截圖通常不含透明區域，不透明時直接轉成 RGB；
+                # 帶 alpha 時與 pyvips 一致合成白底，alpha_composite 在 C 內單次完成
                 image = Image.open(io.BytesIO(screenshot_data))
-                if image.mode in ('RGBA', 'LA'):
-                    background = Image.new('RGB', image.size, (255, 255, 255))
-                    background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                    image = background
+                if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+                    image = image.convert('RGBA')
+                    background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+                    image = Image.alpha_composite(background, image).convert('RGB')
+                elif image.mode != 'RGB':
+                    image = image.convert('RGB')
                 
-                image.save(output_path, 'JPEG', quality=quality, optimize=True)
+                return self.write_image(image, output_path, is_png, quality)
         except Exception as e:
-            safe_print(f"Save screenshot failed: {e}")
+            log.error(f"Save screenshot failed: {e}", exc_info=self.debug)
             raise
     
-    def capture_range_screenshot(self, driver, output_path, start_height=0, end_height=None, quality=95):
+    def capture_range_screenshot(self, driver, output_path, is_png, start_height=0, end_height=None, quality=85):
         """截取範圍截圖"""
         try:
             original_size = driver.get_window_size()
             
-            # 等待頁面完全載入並穩定
-            safe_print("等待頁面完全載入...")
-            time.sleep(3)
-            
-            # 多次檢測頁面高度，確保頁面載入完成
+            # 等待頁面載入並穩定：每次輪詢以一個腳本同時取得 readyState、頁面高度與視窗寬度，
+            # 載入完成且高度連續兩次不變即開始截圖，不再先固定等待
+            log.info("等待頁面完全載入...")
             previous_height = 0
             stable_count = 0
+            viewport_width = None
             
-            for i in range(5):  # 最多檢測5次
+            for i in range(10):  # 最多檢測10次
                 try:
-                    current_height = driver.execute_script("""
-                        return Math.max(
-                            document.body.scrollHeight,
-                            document.documentElement.scrollHeight,
-                            document.body.offsetHeight,
-                            document.documentElement.offsetHeight,
-                            document.body.clientHeight,
-                            document.documentElement.clientHeight
-                        );
-                    """)
+                    dims = self.get_page_dims(driver)
+                    current_height = dims['h']
+                    viewport_width = dims['cw']
                     
-                    if current_height == previous_height:
+                    if dims['ready'] == 'complete' and current_height == previous_height:
                         stable_count += 1
                         if stable_count >= 2:  # 連續2次高度相同，認為穩定
                             break
@@ -560,296 +1181,769 @@ class WebScreenshotTool:
                         stable_count = 0
                     
                     previous_height = current_height
-                    time.sleep(1)
+                    time.sleep(0.5)
                     
                 except:
                     break
             
             total_height = previous_height if previous_height > 0 else original_size['height']
-            safe_print(f"檢測到頁面總高度: {total_height}px")
+            log.info(f"檢測到頁面總高度: {total_height}px")
             
             # 驗證範圍參數
-            safe_print(f"原始參數 - 起始高度: {start_height}px, 結束高度: {end_height}px")
+            log.debug("原始參數 - 起始高度: %spx, 結束高度: %spx", start_height, end_height)
             
             if end_height is None:
                 end_height = total_height
-                safe_print(f"未指定結束高度，使用頁面總高度: {end_height}px")
+                log.info(f"未指定結束高度，使用頁面總高度: {end_height}px")
             
             if start_height < 0:
-                safe_print(f"起始高度 {start_height} 小於 0，調整為 0")
+                log.info(f"起始高度 {start_height} 小於 0，調整為 0")
                 start_height = 0
             
             if end_height > total_height:
-                safe_print(f"結束高度 {end_height} 超過頁面總高度 {total_height}，調整為頁面總高度")
+                log.info(f"結束高度 {end_height} 超過頁面總高度 {total_height}，調整為頁面總高度")
                 end_height = total_height
             
-            safe_print(f"調整後參數 - 起始高度: {start_height}px, 結束高度: {end_height}px, 頁面總高度: {total_height}px")
+            log.debug("調整後參數 - 起始高度: %spx, 結束高度: %spx, 頁面總高度: %spx", start_height, end_height, total_height)
             
             if start_height >= end_height:
-                safe_print(f"❌ 錯誤: 起始高度 ({start_height}) 必須小於結束高度 ({end_height})")
-                safe_print(f"可能原因：")
-                safe_print(f"1. 頁面總高度太小 ({total_height}px)")
-                safe_print(f"2. 指定的起始高度太大")
-                safe_print(f"3. 頁面尚未完全載入")
+                log.error(f"❌ 錯誤: 起始高度 ({start_height}) 必須小於結束高度 ({end_height})")
+                log.info(f"可能原因：")
+                log.info(f"1. 頁面總高度太小 ({total_height}px)")
+                log.info(f"2. 指定的起始高度太大")
+                log.info(f"3. 頁面尚未完全載入")
                 return False
             
             range_height = end_height - start_height
-            safe_print(f"截圖範圍: {start_height}px → {end_height}px (高度: {range_height}px)")
-            
-            # 滾動到起始位置
-            driver.execute_script(f"window.scrollTo(0, {start_height});")
-            time.sleep(2)
+            log.info(f"截圖範圍: {start_height}px → {end_height}px (高度: {range_height}px)")
             
-            viewport_height = original_size['height']
+            if self.stitch_segments or range_height > MAX_CAPTURE_HEIGHT:
+                return self.capture_range_by_segments(driver, output_path, is_png, start_height, end_height, quality,
+                                                      original_size)
             
-            if range_height <= viewport_height:
-                # 單次截圖
-                safe_print("範圍高度適合單次截圖")
-                screenshot = driver.get_screenshot_as_png()
-                
-                if range_height < viewport_height:
-                    try:
-                        image = Image.open(io.BytesIO(screenshot))
-                        crop_bottom = int((range_height / viewport_height) * image.height)
-                        cropped_image = image.crop((0, 0, image.width, crop_bottom))
-                        
-                        buffer = io.BytesIO()
-                        cropped_image.save(buffer, format='PNG')
-                        screenshot = buffer.getvalue()
-                        safe_print("已裁切圖片至指定範圍")
-                    except Exception as e:
-                        safe_print(f"圖片裁切失敗，使用原始截圖: {e}")
-                
-                self.save_screenshot(screenshot, output_path, quality)
-                return True
-            else:
-                # 分段截圖
-                return self.capture_range_by_segments(driver, output_path, start_height, end_height, quality, original_size)
+            # 由 Chrome 以 captureBeyondViewport 依 clip 一次截出整個範圍（clip 為文件座標，不需先捲動），
+            # 省去逐段捲動、等待、解碼與拼接
+            log.info("使用 CDP 單次截取範圍")
+            clip = {'x': 0, 'y': start_height, 'width': viewport_width or original_size['width'],
+                    'height': range_height, 'scale': 1}
+            try:
+                screenshot = self.cdp_screenshot(driver, is_png, quality, clip=clip)
+            except Exception as e:
+                # CDP 不可用時改走捲動 + WebDriver 截圖拼接
+                log.warning(f"CDP range capture failed, stitching segments: {e}")
+                return self.capture_range_by_segments(driver, output_path, is_png, start_height, end_height, quality,
+                                                      original_size)
+            self._write_output(output_path, write_bytes, output_path, screenshot)
+            return True
                 
         except Exception as e:
-            safe_print(f"範圍截圖失敗: {e}")
+            log.error(f"範圍截圖失敗: {e}", exc_info=self.debug)
             return False
     
-    def capture_range_by_segments(self, driver, output_path, start_height, end_height, quality, original_size):
-        """分段截圖並拼接"""
+    def capture_range_by_segments(self, driver, output_path, is_png, start_height, end_height, quality, original_size):
+        """分段截圖並拼接：每段解碼後直接貼進畫布，解碼與下一段的捲動、截圖同時進行"""
+        canvas = None
         try:
-            safe_print("使用分段截圖方法...")
+            log.info("使用分段截圖方法...")
             
             viewport_height = original_size['height']
-            segments = []
-            current_pos = start_height
-            segment_count = 0
             
-            while current_pos < end_height:
-                segment_end = min(current_pos + viewport_height, end_height)
-                actual_height = segment_end - current_pos
-                
-                safe_print(f"截圖段 {segment_count + 1}: {current_pos}px → {segment_end}px")
-                
-                driver.execute_script(f"window.scrollTo(0, {current_pos});")
-                time.sleep(1)
-                
-                screenshot = driver.get_screenshot_as_png()
-                image = Image.open(io.BytesIO(screenshot))
-                
-                if actual_height < viewport_height:
-                    crop_height = int((actual_height / viewport_height) * image.height)
-                    image = image.crop((0, 0, image.width, crop_height))
-                
-                segments.append(image)
-                current_pos = segment_end
-                segment_count += 1
+            # 拼接結果超過輸出格式可寫出的高度時截斷（上限為裝置像素，依 DPI 換算成 CSS px）
+            device_scale = driver.execute_script("return window.devicePixelRatio") or 1
+            max_height = int((MAX_STITCHED_PNG_HEIGHT if is_png else MAX_STITCHED_JPEG_HEIGHT) / device_scale)
+            if end_height - start_height > max_height:
+                log.warning(f"截圖範圍 {end_height - start_height}px 超過輸出高度上限，截斷為 {max_height}px")
+                end_height = start_height + max_height
+            
+            # 各段的起點與高度（CSS px）
+            plan = [(pos, min(viewport_height, end_height - pos))
+                    for pos in range(start_height, end_height, viewport_height)]
+            if not plan:
+                return False
             
-            if segments:
-                total_width = segments[0].width
-                total_height = sum(img.height for img in segments)
-                
-                safe_print(f"拼接 {len(segments)} 個截圖段，總尺寸: {total_width}x{total_height}")
-                
-                final_image = Image.new('RGB', (total_width, total_height), (255, 255, 255))
+            if len(plan) == 1 and plan[0][1] == viewport_height and not self.max_output_width:
+                # 範圍剛好是一整個視窗且捲動未被限制：截圖本身即為結果，PNG 輸出原樣寫出，不經解碼、畫布與重新編碼
+                if driver.execute_script(SCROLL_AND_WAIT_FRAME_JS, start_height) == start_height:
+                    screenshot = driver.get_screenshot_as_png()
+                    self._write_output(output_path, self.save_screenshot, screenshot, output_path, is_png, quality)
+                    log.info(f"分段截圖完成: {output_path}")
+                    return True
+            
+            # 解碼與貼上交給單一背景執行緒依序處理：瀏覽器捲動、重繪下一段時，上一段同時解碼
+            # （Pillow 解碼時釋放 GIL）；稍後才取得結果的只有壓縮過的 PNG 位元組
+            state = {'canvas': None, 'y': 0}
+            
+            def paste_segment(screenshot, actual_height, offset):
+                image = Image.open(io.BytesIO(screenshot))
+                del screenshot
                 
-                y_offset = 0
-                for img in segments:
-                    final_image.paste(img, (0, y_offset))
-                    y_offset += img.height
+                if state['canvas'] is None:
+                    # 以第一段的實際像素高度推算縮放比例，預先配置整張畫布
+                    tile_height = image.height
+                    total_width = image.width
+                    total_height = sum(tile_height if h == viewport_height else int((h / viewport_height) * tile_height)
+                                       for _, h in plan)
+                    log.info(f"拼接 {len(plan)} 個截圖段，總尺寸: {total_width}x{total_height}")
+                    # 各段完整覆蓋整張畫布，沿用的畫布不需重新填白
+                    state['canvas'] = self._acquire_canvas((total_width, total_height))
                 
-                if output_path.lower().endswith('.png'):
-                    final_image.save(output_path, 'PNG')
+                # offset 為要求位置與實際捲動位置的差（CSS px）：捲動被頁尾限制時，該段內容從截圖的 offset 處開始
+                if actual_height < viewport_height:
+                    rows = int((actual_height / viewport_height) * image.height)
                 else:
-                    final_image.save(output_path, 'JPEG', quality=quality, optimize=True)
-                
-                safe_print(f"分段截圖拼接完成: {output_path}")
-                return True
+                    rows = image.height
+                top = min(round(offset * image.height / viewport_height), image.height - rows)
+                if top > 0:
+                    image = image.crop((0, top, image.width, top + rows))
+                # top 為 0 時不另外裁切：最後一段只剩該段的畫布高度，paste 會自動截掉超出畫布的部分
+                state['canvas'].paste(image, (0, state['y']))
+                state['y'] += rows
             
-            return False
+            try:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as decoder:
+                    pending = []
+                    for index, (current_pos, actual_height) in enumerate(plan):
+                        log.debug("截圖段 %d: %spx → %spx", index + 1, current_pos, current_pos + actual_height)
+                        
+                        # 捲動與等待重繪在同一次往返完成，不再固定等待 1 秒；以實際捲動位置決定截圖中的內容範圍
+                        scrolled = driver.execute_script(SCROLL_AND_WAIT_FRAME_JS, current_pos)
+                        offset = max(0, current_pos - scrolled) if isinstance(scrolled, (int, float)) else 0
+                        
+                        pending.append(decoder.submit(paste_segment, driver.get_screenshot_as_png(), actual_height,
+                                                      offset))
+                    
+                    for future in pending:
+                        future.result()
+            finally:
+                canvas = state['canvas']
+            
+            final_image = canvas
+            if self.max_output_width and final_image.width > self.max_output_width:
+                scaled_height = round(final_image.height * self.max_output_width / final_image.width)
+                final_image = final_image.resize((self.max_output_width, scaled_height), Image.LANCZOS)
+                self._release_canvas(canvas)
+            
+            future = self._write_output(output_path, self.write_image, final_image, output_path, is_png, quality)
+            if final_image is canvas:
+                # 背景編碼完成後畫布才可交給下一張截圖
+                stitched = canvas
+                future.add_done_callback(lambda _: self._release_canvas(stitched))
+            canvas = None
+            
+            log.info(f"分段截圖拼接完成: {output_path}")
+            return True
             
         except Exception as e:
-            safe_print(f"分段截圖失敗: {e}")
+            log.error(f"分段截圖失敗: {e}", exc_info=self.debug)
+            if canvas is not None:
+                self._release_canvas(canvas)
             return False
     
-    def capture_full_page(self, driver, output_path, quality=95):
-        """截取完整頁面"""
+    def cdp_screenshot(self, driver, is_png, quality=85, clip=None):
+        """以 CDP 截圖，直接取得輸出檔格式的位元組
+
+        JPEG 輸出由 Chrome 直接編碼，省去 PNG 解碼再轉 JPEG 的過程。
+        """
+        params = {"captureBeyondViewport": clip is not None, "fromSurface": True}
+        if is_png:
+            params["format"] = "png"
+        else:
+            params["format"] = "jpeg"
+            params["quality"] = quality
+        if self.max_output_width:
+            clip = self._clip_to_max_width(driver, clip)
+        if clip is not None:
+            params["clip"] = clip
+        
+        # 直接經 DevTools websocket 取得結果，省去 ChromeDriver 解析後再包成 WebDriver 回應的一次 JSON 轉換；
+        # 無法連線時改走 execute_cdp_cmd
+        result = self.devtools_command(driver, "Page.captureScreenshot", params)
+        if result is None:
+            result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+        
+        # 取出 base64 字串後立即解碼並釋放，避免 base64 與解碼結果兩份大型資料同時存在太久
+        return base64.b64decode(result.pop("data"))
+    
+    def _clip_to_max_width(self, driver, clip):
+        """輸出寬度超過 --max-output-width 時調整 clip 的 scale，由 Chrome 直接以較小尺寸點陣化與編碼"""
+        dpr, view = driver.execute_script(
+            "return [window.devicePixelRatio, {x: window.scrollX, y: window.scrollY, "
+            "width: window.innerWidth, height: window.innerHeight, scale: 1}];")
+        clip = dict(clip or view)
+        output_width = clip['width'] * clip.get('scale', 1) * dpr
+        if output_width > self.max_output_width:
+            clip['scale'] = clip.get('scale', 1) * self.max_output_width / output_width
+            log.debug("縮小輸出寬度: %.0fpx → %spx", output_width, self.max_output_width)
+        return clip
+    
+    def get_page_dims(self, driver):
+        """以一次 JS 往返取得 readyState 與頁面/視窗尺寸（PAGE_DIMS_JS 的結果）
+
+        頁面隨時可能重排，結果不快取，每次呼叫都重新量測。
+        """
+        return driver.execute_script(PAGE_DIMS_JS)
+    
+    def measure_page(self, driver):
+        """取得 (頁面寬, 頁面高, 視窗寬, 視窗高, DPR)，單位為 CSS px
+
+        優先使用 CDP Page.getLayoutMetrics（一次往返，DPR 由裝置像素與 CSS 尺寸的比例推得），
+        不支援時改以 JS 量測，再不行才使用視窗大小。
+        """
         try:
+            metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+            content = metrics['cssContentSize']
+            viewport = metrics['cssLayoutViewport']
+            device_scale = metrics['contentSize']['width'] / content['width'] if content['width'] else 1
+            return (int(content['width']), int(content['height']),
+                    viewport['clientWidth'], viewport['clientHeight'], device_scale)
+        except Exception as e:
+            log.debug("Page.getLayoutMetrics unavailable, measuring with JS: %s", e)
+        
+        try:
+            dims = self.get_page_dims(driver)
+            return dims['w'], dims['h'], dims['vw'], dims['vh'], dims['dpr']
+        except Exception as e:
+            log.warning(f"Failed to get page dimensions: {e}")
             original_size = driver.get_window_size()
+            return original_size['width'], original_size['height'], original_size['width'], original_size['height'], 1
+    
+    def capture_full_page(self, driver, output_path, is_png, quality=85, start_height=0):
+        """截取完整頁面（可指定起始高度，截取至頁面底部）"""
+        try:
+            total_width, total_height, viewport_width, viewport_height, device_scale = self.measure_page(driver)
             
-            try:
-                total_width = driver.execute_script("""
-                    return Math.max(
-                        document.body.scrollWidth,
-                        document.documentElement.scrollWidth,
-                        document.body.offsetWidth,
-                        document.documentElement.offsetWidth,
-                        document.body.clientWidth,
-                        document.documentElement.clientWidth
-                    );
-                """)
-                
-                total_height = driver.execute_script("""
-                    return Math.max(
-                        document.body.scrollHeight,
-                        document.documentElement.scrollHeight,
-                        document.body.offsetHeight,
-                        document.documentElement.offsetHeight,
-                        document.body.clientHeight,
-                        document.documentElement.clientHeight
-                    );
-                """)
-            except Exception as e:
-                safe_print(f"Failed to get page dimensions: {e}")
-                total_width = original_size['width']
-                total_height = original_size['height']
-            
-            safe_print(f"Full page dimensions: {total_width} x {total_height}")
+            log.info(f"Full page dimensions: {total_width} x {total_height}")
             
             max_width = 7680
-            max_height = 20000
             
             if total_width > max_width:
                 total_width = max_width
-            if total_height > max_height:
-                total_height = max_height
+            
+            if start_height >= total_height:
+                log.error(f"❌ 錯誤: 起始高度 ({start_height}) 超過頁面總高度 ({total_height})")
+                return False
+            capture_height = total_height - start_height
+            
+            # 很長的頁面改用分段截圖拼接：視窗維持原尺寸，Chrome 記憶體不隨頁面長度增加，也不受高度上限截斷
+            if capture_height > viewport_height * 4:
+                log.info("Page is taller than 4 viewports, using tiled capture")
+                return self.capture_range_by_segments(driver, output_path, is_png, start_height, total_height, quality,
+                                                      {'width': total_width, 'height': viewport_height})
+            
+            if capture_height > MAX_CAPTURE_HEIGHT:
+                capture_height = MAX_CAPTURE_HEIGHT
             
             try:
-                driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
-                driver.set_window_size(total_width, total_height)
-                time.sleep(3)
-                driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
-            except:
-                pass
+                screenshot = self._cdp_full_page(driver, is_png, quality, start_height, total_width,
+                                                 total_height, capture_height, viewport_width, viewport_height,
+                                                 device_scale)
+            except Exception as e:
+                log.warning(f"CDP full page capture failed, falling back to window resize: {e}")
+                screenshot = None
+            
+            if screenshot is None:
+                # 無法使用 CDP（例如非 Chrome 的 driver）：頁首開始時調整視窗截圖，否則分段截圖
+                if start_height == 0:
+                    return self.capture_full_page_by_resize(driver, output_path, is_png, total_width, capture_height,
+                                                            quality)
+                return self.capture_range_by_segments(driver, output_path, is_png, start_height,
+                                                      start_height + capture_height, quality,
+                                                      {'width': viewport_width, 'height': viewport_height})
+            self._write_output(output_path, write_bytes, output_path, screenshot)
+            
+            log.info(f"Full page screenshot saved: {output_path}")
+            return True
             
+        except Exception as e:
+            log.error(f"Full page screenshot failed: {e}", exc_info=self.debug)
+            return False
+    
+    def _cdp_full_page(self, driver, is_png, quality, start_height, total_width, total_height,
+                       capture_height, viewport_width, viewport_height, device_scale):
+        """以 CDP 將虛擬視窗設為整頁尺寸後一次截圖，不需調整實體視窗，也不必等待重排"""
+        driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+            "width": total_width,
+            "height": total_height,
+            "deviceScaleFactor": device_scale,
+            "mobile": False
+        })
+        try:
+            # 由 Chrome 直接裁切起始高度以下的區域，不需再以 PIL 裁切
+            return self.cdp_screenshot(driver, is_png, quality, clip={
+                "x": 0, "y": start_height, "width": total_width, "height": capture_height, "scale": 1
+            })
+        finally:
+            # 還原視窗設定；有指定 DPI 時保留縮放倍數
+            if device_scale != 1:
+                driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+                    "width": viewport_width,
+                    "height": viewport_height,
+                    "deviceScaleFactor": device_scale,
+                    "mobile": False
+                })
+            else:
+                driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+    
+    def capture_full_page_by_resize(self, driver, output_path, is_png, width, height, quality=85):
+        """CDP 不可用時的備援：暫時把視窗調成整頁大小，以 WebDriver 截圖後還原"""
+        if height > MAX_CAPTURE_HEIGHT:
+            log.warning(f"頁面高度 {height}px 超過單次截圖上限，截斷為 {MAX_CAPTURE_HEIGHT}px")
+            height = MAX_CAPTURE_HEIGHT
+        original_size = driver.get_window_size()
+        try:
+            driver.set_window_size(width, height)
+            self.wait_for_settled(driver, 3)
             screenshot = driver.get_screenshot_as_png()
-            self.save_screenshot(screenshot, output_path, quality)
-            
+        except Exception as e:
+            log.error(f"Full page screenshot failed: {e}", exc_info=self.debug)
+            return False
+        finally:
             try:
                 driver.set_window_size(original_size['width'], original_size['height'])
             except:
                 pass
-            
-            safe_print(f"Full page screenshot saved: {output_path}")
+        
+        # WebDriver 截圖無法由 Chrome 縮放，與分段拼接相同以 LANCZOS 縮小至 --max-output-width
+        if self.max_output_width:
+            image = Image.open(io.BytesIO(screenshot))
+            if image.width > self.max_output_width:
+                scaled_height = round(image.height * self.max_output_width / image.width)
+                image = image.convert('RGB').resize((self.max_output_width, scaled_height), Image.LANCZOS)
+                self._write_output(output_path, self.write_image, image, output_path, is_png, quality)
+                log.info(f"Full page screenshot saved: {output_path}")
+                return True
+        
+        self._write_output(output_path, self.save_screenshot, screenshot, output_path, is_png, quality)
+        log.info(f"Full page screenshot saved: {output_path}")
+        return True
+    
+    def capture_viewport(self, driver, output_path, is_png, quality=85):
+        """截取視窗截圖"""
+        try:
+            screenshot = self.cdp_screenshot(driver, is_png, quality)
+            self._write_output(output_path, write_bytes, output_path, screenshot)
+            log.info(f"Viewport screenshot saved: {output_path}")
             return True
-            
         except Exception as e:
-            safe_print(f"Full page screenshot failed: {e}")
+            log.error(f"Viewport screenshot failed: {e}", exc_info=self.debug)
             return False
     
-    def capture_viewport(self, driver, output_path, quality=95):
-        """截取視窗截圖"""
+    def capture_element(self, driver, css_selector, output_path, is_png, quality=85):
+        """只截取指定元素（例如單一 Grafana panel），以 CDP clip 直接截出元素範圍"""
         try:
-            screenshot = driver.get_screenshot_as_png()
-            self.save_screenshot(screenshot, output_path, quality)
-            safe_print(f"Viewport screenshot saved: {output_path}")
+            rect = driver.execute_script("""
+                const e = document.querySelector(arguments[0]);
+                if (!e) return null;
+                const r = e.getBoundingClientRect();
+                return {x: r.x + window.scrollX, y: r.y + window.scrollY, w: r.width, h: r.height};
+            """, css_selector)
+            if not rect or rect['w'] <= 0 or rect['h'] <= 0:
+                log.error(f"❌ 找不到可截圖的元素: {css_selector}")
+                return False
+            
+            log.info(f"元素範圍: {rect['w']:.0f}x{rect['h']:.0f} @ ({rect['x']:.0f}, {rect['y']:.0f})")
+            clip = {'x': rect['x'], 'y': rect['y'], 'width': rect['w'], 'height': rect['h'], 'scale': 1}
+            screenshot = self.cdp_screenshot(driver, is_png, quality, clip=clip)
+            self._write_output(output_path, write_bytes, output_path, screenshot)
+            log.info(f"Element screenshot saved: {output_path}")
             return True
         except Exception as e:
-            safe_print(f"Viewport screenshot failed: {e}")
+            log.error(f"Element screenshot failed: {e}", exc_info=self.debug)
             return False
     
+    def capture_current_page(self, driver, output_path, is_png, full_page=True, quality=85,
+                             start_height=0, end_height=None, element=None):
+        """依模式截取目前分頁；is_png 由呼叫端依輸出檔名判斷一次後傳入各截圖與編碼步驟"""
+        if element:
+            log.info(f"Taking element screenshot: {element}")
+            return self.capture_element(driver, element, output_path, is_png, quality)
+        elif end_height is not None:
+            log.info("執行範圍截圖...")
+            return self.capture_range_screenshot(driver, output_path, is_png, start_height, end_height, quality)
+        elif full_page:
+            log.info("Taking full page screenshot...")
+            return self.capture_full_page(driver, output_path, is_png, quality, start_height)
+        else:
+            log.info("Taking viewport screenshot...")
+            return self.capture_viewport(driver, output_path, is_png, quality)
+    
     def capture_screenshot(self, url, output_path="screenshot.png", width=1920, height=1080, 
-                          full_page=True, wait_time=3, quality=95,
-                          username=None, password=None, start_height=0, end_height=None):
-        """主要截圖功能 - 支援 Grafana/OpenShift 登入和範圍截圖"""
-        driver = None
+                          full_page=True, wait_time=3, quality=85,
+                          username=None, password=None, start_height=0, end_height=None,
+                          dpi=1.0, element=None, settle_time=0, driver=None):
+        """主要截圖功能 - 支援 Grafana/OpenShift 登入和範圍截圖
+
+        若傳入 driver 則沿用既有瀏覽器（daemon 模式）；否則使用快取的 driver，
+        於 close_all() 或程式結束時才關閉。
+        """
+        driver_key = None
         try:
-            safe_print("Starting Chrome browser...")
-            driver = self.setup_driver(width, height, True)
+            if driver is None:
+                # DPI 以啟動參數設定，不同 DPI 各自快取一個 driver
+                driver_key = (width, height, True, dpi)
+                driver, reused = self._get_or_create_driver(driver_key)
+            else:
+                reused = True
+                driver.set_window_size(width, height)
             
             if not driver:
                 return False
             
+            if reused:
+                self.reset_driver(driver)
+            
+            if driver_key is None:
+                # 沿用外部傳入的 driver（daemon 模式）時無法改啟動參數，改以 CDP 於導航前設定 DPI
+                if dpi != 1.0:
+                    log.info(f"Device scale factor: {dpi}")
+                    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+                        "width": width,
+                        "height": height,
+                        "deviceScaleFactor": dpi,
+                        "mobile": False
+                    })
+                else:
+                    driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+            elif reused:
+                driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+            
             # 檢查是否需要登入
-            parsed_url = urlparse(url)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+            base_url = base_url_of(url)
             need_login = username and password
+            session_valid = False
             
-            if need_login:
+            # 使用持久化 profile 時先直接開啟目標頁，沒被導向登入頁就表示 session 仍有效
+            if need_login and self.profile_dir:
+                log.info(f"Loading webpage: {url}")
+                driver.get(url)
+                self._poll_ready(driver, self.page_load_timeout)
+                session_valid = '/login' not in driver.current_url.lower()
+                if session_valid:
+                    log.info("✅ 既有登入 session 仍有效，略過登入")
+            
+            if session_valid:
+                pass
+            elif need_login:
                 # 執行自動偵測登入
-                safe_print(f"檢測到登入認證，自動偵測系統類型...")
+                log.info(f"檢測到登入認證，自動偵測系統類型...")
                 login_success = self.auto_detect_login_type(driver, base_url, username, password)
                 
                 if login_success:
-                    safe_print(f"✅ 登入成功！正在導航到目標頁面...")
-                    safe_print(f"Target URL: {url}")
+                    log.info(f"✅ 登入成功！正在導航到目標頁面...")
+                    log.info(f"Target URL: {url}")
                     driver.get(url)
                     
                     # 等待頁面載入完成
-                    safe_print("等待頁面載入...")
-                    time.sleep(5)
+                    log.info("等待頁面載入...")
+                    self.wait_for_load(driver, self.page_load_timeout)
                     
                     # 嘗試等待載入指示器消失
                     try:
                         WebDriverWait(driver, 10).until_not(
                             EC.presence_of_element_located((By.CSS_SELECTOR, ".loading, .spinner, [data-testid='loading']"))
                         )
-                        safe_print("載入指示器已消失")
+                        log.debug("載入指示器已消失")
                     except:
-                        safe_print("未發現載入指示器或已載入完成")
-                    
-                    # 再等待一些時間確保內容完全渲染
-                    safe_print("等待內容完全渲染...")
-                    time.sleep(3)
+                        log.debug("未發現載入指示器或已載入完成")
                 else:
-                    safe_print("❌ 登入失敗，嘗試直接存取 URL...")
+                    log.warning("❌ 登入失敗，嘗試直接存取 URL...")
                     driver.get(url)
             else:
                 # 直接存取 URL
-                safe_print(f"Loading webpage: {url}")
+                log.info(f"Loading webpage: {url}")
                 driver.get(url)
             
-            safe_print("Waiting for page to load...")
+            log.info("Waiting for page to load...")
             self.wait_for_page_load(driver)
             
             if wait_time > 0:
-                safe_print(f"Additional wait: {wait_time} seconds...")
-                time.sleep(wait_time)
-            
-            # 決定截圖模式
-            if end_height is not None:
-                safe_print("執行範圍截圖...")
-                success = self.capture_range_screenshot(driver, output_path, start_height, end_height, quality)
-            elif full_page:
-                safe_print("Taking full page screenshot...")
-                success = self.capture_full_page(driver, output_path, quality)
-            else:
-                safe_print("Taking viewport screenshot...")
-                success = self.capture_viewport(driver, output_path, quality)
+                log.info(f"Waiting up to {wait_time} seconds for the page to settle...")
+                self.wait_for_settled(driver, wait_time)
             
-            return success
+            if settle_time > 0:
+                time.sleep(settle_time)
+            
+            is_png = output_path.lower().endswith('.png')
+            success = self.capture_current_page(driver, output_path, is_png, full_page, quality,
+                                                start_height, end_height, element)
+            return success and not self.wait_for_writes()
                 
         except Exception as e:
-            safe_print(f"Screenshot failed: {e}")
+            log.error(f"Screenshot failed: {e}", exc_info=self.debug)
+            # 發生錯誤的瀏覽器狀態不明，不再沿用
+            if driver_key is not None:
+                self.discard_driver(driver_key)
             return False
+    
+    def spawn(self):
+        """以相同設定建立另一個截圖工具，各自持有自己的 Chrome（WebDriver 不可跨執行緒共用）"""
+        return WebScreenshotTool(
+            chromedriver_path=self.chromedriver_path,
+            page_load_timeout=self.page_load_timeout,
+            no_images=self.no_images,
+            wait_jquery=self.wait_jquery,
+            profile_dir=self.profile_dir,
+            optimize_jpeg=self.optimize_jpeg,
+            max_driver_runs=self.max_driver_runs,
+            block_patterns=self.block_patterns,
+            gpu_raster=self.gpu_raster,
+            swiftshader=self.swiftshader,
+            max_output_width=self.max_output_width,
+            debug=self.debug,
+            tmpfs_profile=self.tmpfs_profile,
+            stitch_segments=self.stitch_segments
+        )
+    
+    def capture_many(self, jobs, width=1920, height=1080, full_page=True, wait_time=3, quality=85,
+                     username=None, password=None, start_height=0, end_height=None, element=None,
+                     settle_time=0, dpi=1.0, parallelism=1):
+        """批次截圖：單一 Chrome 以多個分頁同時載入，jobs 為 (url, output_path) 列表
+
+        parallelism > 1 時將工作輪流分配給多個 Chrome，各由一個執行緒驅動；
+        持久化 profile 無法由多個 Chrome 同時使用，此時固定只用一個。
+        """
+        options = dict(width=width, height=height, full_page=full_page, wait_time=wait_time, quality=quality,
+                       username=username, password=password, start_height=start_height, end_height=end_height,
+                       element=element, settle_time=settle_time, dpi=dpi)
+        parallelism = min(parallelism, len(jobs))
+        if parallelism > 1 and not self.profile_dir:
+            return self._capture_many_parallel(jobs, parallelism, options)
+        
+        results = [False] * len(jobs)
+        driver_key = (width, height, True, dpi)
+        try:
+            driver, _ = self._get_or_create_driver(driver_key)
+            if not driver or not jobs:
+                return results
+            main_handle = driver.current_window_handle
+            
+            # 登入只需做一次，各分頁共用 cookie
+            if username and password:
+                base_url = base_url_of(jobs[0][0])
+                log.info(f"檢測到登入認證，自動偵測系統類型...")
+                if not self.auto_detect_login_type(driver, base_url, username, password):
+                    log.warning("❌ 登入失敗，嘗試直接存取 URL...")
+            
+            # 先為每個 URL 建立分頁，讓所有頁面同時開始載入
+            targets = []
+            for url, _ in jobs:
+                log.info(f"Loading webpage: {url}")
+                target_id = None
+                try:
+                    # 請求計數與資源封鎖都是分頁層級設定，需先開空白頁設定後再以不等待載入的 Page.navigate 導航
+                    target_id = driver.execute_cdp_cmd("Target.createTarget", {
+                        "url": "about:blank", "width": width, "height": height
+                    })["targetId"]
+                    driver.switch_to.window(target_id)
+                    self.install_request_counter(driver)
+                    self.apply_url_blocking(driver)
+                    driver.execute_cdp_cmd("Page.navigate", {"url": url})
+                    targets.append(target_id)
+                except Exception as e:
+                    log.error(f"Failed to open tab for {url}: {e}", exc_info=self.debug)
+                    targets.append(None)
+                    # 已建立但設定失敗的分頁不會再被截圖，直接關閉
+                    if target_id:
+                        try:
+                            driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+                            driver.switch_to.window(main_handle)
+                        except:
+                            pass
+            
+            waited = False
+            for index, ((url, output_path), target_id) in enumerate(zip(jobs, targets)):
+                if not target_id:
+                    continue
+                try:
+                    # ChromeDriver 的視窗 handle 即為 CDP target id
+                    driver.switch_to.window(target_id)
+                    driver.execute_cdp_cmd("Page.bringToFront", {})
+                    
+                    log.info(f"Waiting for page to load: {url}")
+                    self.wait_for_page_load(driver)
+                    
+                    if wait_time > 0:
+                        log.info(f"Waiting up to {wait_time} seconds for the page to settle...")
+                        self.wait_for_settled(driver, wait_time)
+                    
+                    # 分頁同時載入，固定等待只需一次
+                    if settle_time > 0 and not waited:
+                        time.sleep(settle_time)
+                        waited = True
+                    
+                    is_png = output_path.lower().endswith('.png')
+                    results[index] = self.capture_current_page(driver, output_path, is_png, full_page, quality,
+                                                               start_height, end_height, element)
+                except Exception as e:
+                    log.error(f"Screenshot failed for {url}: {e}", exc_info=self.debug)
+                finally:
+                    # 截圖失敗也要關閉分頁並切回主視窗，否則分頁會留在重複使用的 Chrome 中
+                    # 以 target id 關閉，切換分頁失敗時也不會誤關主視窗
+                    try:
+                        driver.execute_cdp_cmd("Target.closeTarget", {"targetId": target_id})
+                    except:
+                        pass
+                    driver.switch_to.window(main_handle)
+            
+            # 各分頁的編碼與截圖重疊進行，最後才收集寫檔結果
+            failed = set(self.wait_for_writes())
+            return [ok and output_path not in failed for ok, (_, output_path) in zip(results, jobs)]
+        
+        except Exception as e:
+            log.error(f"Batch screenshot failed: {e}", exc_info=self.debug)
+            self.discard_driver(driver_key)
+            return results
+    
+    def _capture_many_parallel(self, jobs, parallelism, options):
+        """將 jobs 依序輪流分給 parallelism 個工具（第一個為自己），以執行緒同時截圖"""
+        tools = [self] + [self.spawn() for _ in range(parallelism - 1)]
+        results = [False] * len(jobs)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+                futures = {
+                    index: executor.submit(tool.capture_many, jobs[index::parallelism], **options)
+                    for index, tool in enumerate(tools)
+                }
+                for index, future in futures.items():
+                    results[index::parallelism] = future.result()
         finally:
-            if driver:
+            for tool in tools[1:]:
+                tool.close()
+        return results
+    
+    def serve(self, address=DEFAULT_DAEMON_ADDRESS, width=1920, height=1080):
+        """Daemon 模式：常駐一個 Chrome，透過本機 socket 接收截圖工作"""
+        host, port = parse_address(address)
+        
+        log.info("Starting Chrome browser (daemon)...")
+        driver = self.setup_driver(width, height, True)
+        if not driver:
+            return False
+        
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            server.bind((host, port))
+            server.listen(5)
+            log.info(f"Daemon listening on {host}:{port}")
+            
+            shutdown = False
+            while not shutdown:
+                conn, _ = server.accept()
+                # 每個連線各自處理錯誤：逾時未送出工作或提早斷線的客戶端只中斷自己的連線，不會停止 daemon
                 try:
-                    driver.quit()
-                except:
-                    pass
+                    conn.settimeout(DAEMON_CLIENT_TIMEOUT)
+                    with conn, conn.makefile('rwb') as stream:
+                        job = parse_daemon_job(stream.readline())
+                        if job is None:
+                            stream.write(b'{"success": false}\n')
+                            continue
+                        
+                        if job.get('shutdown'):
+                            shutdown = True
+                            stream.write(b'{"success": true}\n')
+                            continue
+                        
+                        log.info(f"Job received: {job['url']}")
+                        try:
+                            success = self.capture_screenshot(driver=driver, **job)
+                        except Exception as e:
+                            log.error(f"Screenshot failed for {job['url']}: {e}", exc_info=self.debug)
+                            success = False
+                        stream.write(json.dumps({'success': bool(success)}).encode('utf-8') + b'\n')
+                except OSError as e:
+                    log.info(f"Client connection dropped: {e}")
+            
+            return True
+        except Exception as e:
+            log.error(f"Daemon failed: {e}", exc_info=self.debug)
+            return False
+        finally:
+            server.close()
+            try:
+                driver.quit()
+            except:
+                pass
+
+def parse_address(address):
+    """解析 host:port 位址"""
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def parse_daemon_job(line):
+    """解析 daemon 收到的一行工作：只接受 DAEMON_JOB_KEYS 中的欄位且 URL 必須有效，不合法時回傳 None"""
+    try:
+        job = json.loads(line.decode('utf-8'))
+    except ValueError as e:
+        log.info(f"Invalid job: {e}")
+        return None
+    if not isinstance(job, dict):
+        log.info("Invalid job: not a JSON object")
+        return None
+    if job.get('shutdown'):
+        return {'shutdown': True}
+    
+    unknown = set(job) - DAEMON_JOB_KEYS
+    if unknown:
+        log.info(f"Invalid job: unsupported keys {', '.join(sorted(unknown))}")
+        return None
+    url = normalize_url(job['url']) if isinstance(job.get('url'), str) else None
+    if not url:
+        log.info(f"Invalid job: invalid URL {job.get('url')!r}")
+        return None
+    job['url'] = url
+    return job
+
+def send_job(address, job, timeout=None):
+    """將截圖工作送往 daemon 並等待結果"""
+    host, port = parse_address(address)
+    with socket.create_connection((host, port), timeout=timeout) as conn, conn.makefile('rwb') as stream:
+        stream.write(json.dumps(job).encode('utf-8') + b'\n')
+        stream.flush()
+        reply = stream.readline()
+    return bool(reply) and json.loads(reply.decode('utf-8')).get('success', False)
+
+# 平行截圖的工作程序：每個程序各自持有一個 WebScreenshotTool（各自的 Chrome/ChromeDriver）
+_worker_tool = None
+
+def _init_worker(tool_kwargs, log_queue, log_level):
+    """工作程序初始化：日誌送回主程序統一輸出，並建立該程序專用的截圖工具"""
+    global _worker_tool
+    # fork 時會繼承主程序的 handler，先移除以免多個程序同時寫 stdout
+    log.handlers.clear()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(log_level)
+    _worker_tool = WebScreenshotTool(**tool_kwargs)
+    # 工作程序結束時不會執行 atexit，改以 multiprocessing 的 finalizer 關閉 Chrome
+    multiprocessing.util.Finalize(_worker_tool, _worker_tool.close_all, exitpriority=10)
+
+def _run_worker_job(job):
+    """在工作程序中執行單一截圖工作"""
+    return _worker_tool.capture_screenshot(**job)
+
+def output_paths_for(output, count):
+    """多個 URL 時依序為輸出檔加上編號，例如 screenshot_1.png、screenshot_2.png"""
+    if count == 1:
+        return [output]
+    stem, ext = os.path.splitext(output)
+    return [f"{stem}_{index}{ext}" for index in range(1, count + 1)]
+
+def jpeg_quality(text):
+    """--quality 的型別檢查：1-100 的整數；以範圍比較取代 choices=range(1, 101)，說明與錯誤訊息不必列出 100 個值"""
+    import argparse
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}")
+    if not 1 <= value <= 100:
+        raise argparse.ArgumentTypeError(f"must be between 1 and 100, got {value}")
+    return value
 
 def create_parser():
-    """建立命令列參數解析器"""
+    """建立命令列參數解析器（argparse 只有命令列用得到，作為函式庫匯入時不載入）"""
+    import argparse
     parser = argparse.ArgumentParser(
-        description="Web Screenshot Tool v2.2.0 with Range Screenshot Support",
+        description=f"Web Screenshot Tool v{VERSION} with Range Screenshot Support",
         epilog="""
 Examples:
   %(prog)s https://www.example.com
@@ -857,17 +1951,56 @@ Examples:
   %(prog)s https://openshift-console.apps.cluster.com --username admin --password 123456
   %(prog)s https://example.com --start-height 300 --end-height 1200 --output range.png
   %(prog)s https://example.com --width 1920 --height 1080 --output screenshot.png
+  %(prog)s https://example.com --preset 4k --output screenshot.jpg
+  %(prog)s https://example.com https://example.org --jobs 2 --output shot.png
+  %(prog)s https://grafana.com/d/abc --element "[data-panelid='2']" --output panel.png
+  %(prog)s --daemon
+  %(prog)s https://example.com --connect 127.0.0.1:9520 --output screenshot.png
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
     
-    parser.add_argument('url', help='Target webpage URL')
-    parser.add_argument('-o', '--output', default='screenshot.png', help='Output filename (default: screenshot.png)')
+    parser.add_argument('url', nargs='*', help='Target webpage URL(s)')
+    parser.add_argument('-o', '--output', default='screenshot.png',
+                        help='Output filename; numbered (name_1.png, ...) when several URLs are given (default: screenshot.png)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Capture several URLs in parallel with this many browser processes (default: 1)')
+    parser.add_argument('--tabs', action='store_true',
+                        help='Load all URLs at once as tabs of one Chrome (shared cache and login); '
+                             'with --jobs, spread the tabs over that many browsers')
     parser.add_argument('-w', '--width', type=int, default=1920, help='Browser window width (default: 1920)')
     parser.add_argument('--height', type=int, default=1080, help='Browser window height (default: 1080)')
     parser.add_argument('--no-full-page', action='store_true', help='Capture viewport only instead of full page')
-    parser.add_argument('--wait', type=int, default=3, help='Wait time in seconds after page load (default: 3)')
-    parser.add_argument('--quality', type=int, default=95, choices=range(1, 101), help='JPEG quality 1-100 (default: 95)')
+    parser.add_argument('--element', metavar='SELECTOR', help='Capture only the element matching this CSS selector')
+    parser.add_argument('--wait', type=int, default=3,
+                        help='Max seconds to wait for the page to settle after load (default: 3)')
+    parser.add_argument('--settle', type=float, default=0,
+                        help='Extra fixed sleep in seconds before capturing, for animations (default: 0)')
+    parser.add_argument('--quality', type=jpeg_quality, default=85, metavar='1-100', help='JPEG quality 1-100 (default: 85)')
+    parser.add_argument('--max-output-width', type=int, metavar='PX',
+                        help='Downscale output wider than PX pixels (keeps aspect ratio)')
+    parser.add_argument('--optimize', '--optimize-jpeg', action='store_true', help='Run the extra JPEG Huffman optimization pass on images under 4 megapixels (smaller, slower)')
+    parser.add_argument('--no-images', action='store_true', help='Do not load images (faster text/layout-only captures)')
+    parser.add_argument('--dpi', type=float, default=1.0, help='Device scale factor, e.g. 2 for retina output (default: 1.0)')
+    parser.add_argument('--preset', choices=list(PRESETS),
+                        help='High-resolution preset; sets --width, --height and --dpi (e.g. 4k = 1920x1080 at 2x)')
+    parser.add_argument('--gpu-raster', action='store_true',
+                        help='Rasterize through ANGLE/GPU (ANGLE picks the available backend)')
+    parser.add_argument('--swiftshader', action='store_true',
+                        help='With GPU raster, force the SwiftShader software backend (for hosts without a GPU); implies --gpu-raster')
+    parser.add_argument('--wait-jquery', action='store_true', help='Also wait until pending jQuery AJAX requests finish')
+    # 網址位置參數為 nargs='*'，封鎖樣式改為可重複的單值選項，才不會把後面的網址當成樣式
+    parser.add_argument('--block-default', action='store_true',
+                        help='Block analytics/tracking scripts, gravatars and source maps')
+    parser.add_argument('--block-pattern', '--block-patterns', dest='block_patterns', action='append',
+                        metavar='PATTERN', help='Block resource URLs matching PATTERN (repeatable)')
+    parser.add_argument('--profile-dir', help='Persistent Chrome profile directory; reuses login sessions across runs')
+    parser.add_argument('--tmpfs-profile', action='store_true',
+                        help='Keep the temporary Chrome profile and disk cache in /dev/shm (needs enough shared memory)')
+    parser.add_argument('--stitch-segments', action='store_true',
+                        help='Capture ranges by scrolling and stitching viewport shots instead of one CDP capture')
+    parser.add_argument('--page-load-timeout', type=int, default=30,
+                        help='Max seconds to wait for page load / network idle (default: 30)')
     
     # Authentication Options
     auth_group = parser.add_argument_group('Authentication Options')
@@ -881,56 +2014,131 @@ Examples:
     range_group.add_argument('--end-height', type=int, 
                             help='End height in pixels for range screenshot (if not specified, captures to page end)')
     
-    parser.add_argument('--version', action='version', version='WebScreenshot v2.2.0')
+    # Logging Options
+    logging_group = parser.add_argument_group('Logging Options')
+    verbosity = logging_group.add_mutually_exclusive_group()
+    verbosity.add_argument('-q', '--quiet', action='store_true', help='Only print warnings and errors')
+    verbosity.add_argument('-v', '--verbose', action='store_true', help='Print detailed progress (selectors, segments, etc.)')
+    verbosity.add_argument('--debug', action='store_true', help='Like --verbose, and include stack traces for errors')
+    
+    # Daemon Options
+    daemon_group = parser.add_argument_group('Daemon Options')
+    daemon_group.add_argument('--daemon', nargs='?', const=DEFAULT_DAEMON_ADDRESS, metavar='ADDR',
+                              help=f'Keep Chrome running and serve screenshot jobs on ADDR (default: {DEFAULT_DAEMON_ADDRESS})')
+    daemon_group.add_argument('--connect', metavar='ADDR',
+                              help='Send the screenshot job to a running daemon instead of starting Chrome')
+    
+    parser.add_argument('--version', action='version', version=VERSION_STRING)
     
     return parser
 
 def main():
     """主函數"""
+    if sys.argv[1:] == ['--version']:
+        print(VERSION_STRING)
+        return 0
+    
     parser = create_parser()
     args = parser.parse_args()
     
-    # 驗證 URL
-    tool = WebScreenshotTool()
-    if not tool.validate_url(args.url):
-        safe_print(f"Error: Invalid URL format: {args.url}")
-        return 1
+    if args.quiet:
+        log_level = logging.WARNING
+    elif args.verbose or args.debug:
+        log_level = logging.DEBUG
+    else:
+        log_level = logging.INFO
+    setup_logging(log_level)
+    
+    if args.preset:
+        args.width, args.height, args.dpi = PRESETS[args.preset]
+    
+    tool_kwargs = dict(
+        page_load_timeout=args.page_load_timeout,
+        no_images=args.no_images,
+        wait_jquery=args.wait_jquery,
+        profile_dir=args.profile_dir,
+        optimize_jpeg=args.optimize,
+        gpu_raster=args.gpu_raster,
+        swiftshader=args.swiftshader,
+        max_output_width=args.max_output_width,
+        debug=args.debug,
+        tmpfs_profile=args.tmpfs_profile,
+        stitch_segments=args.stitch_segments,
+        block_patterns=(DEFAULT_BLOCK_PATTERNS if args.block_default else []) + (args.block_patterns or [])
+    )
+    
+    # Daemon 模式
+    if args.daemon:
+        tool = WebScreenshotTool(**tool_kwargs)
+        return 0 if tool.serve(args.daemon, args.width, args.height) else 1
+    
+    if not args.url:
+        parser.error("the following arguments are required: url")
+    
+    # 驗證 URL（缺少協定時補上 https://）
+    urls = []
+    for raw_url in args.url:
+        url = normalize_url(raw_url)
+        if url is None:
+            log.error(f"Error: Invalid URL format: {raw_url}")
+            return 1
+        urls.append(url)
+    outputs = output_paths_for(args.output, len(urls))
+    
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
     
-    # 確保 URL 有協定
-    if not args.url.startswith(('http://', 'https://')):
-        args.url = 'https://' + args.url
+    if args.jobs > 1 and args.profile_dir:
+        # 同一個 profile 目錄一次只能由一個 Chrome 使用
+        log.warning("--profile-dir cannot be shared between browser processes; using --jobs 1")
+        args.jobs = 1
     
     # 驗證範圍參數
     if args.end_height is not None and args.start_height >= args.end_height:
-        safe_print(f"Error: Start height ({args.start_height}) must be less than end height ({args.end_height})")
+        log.error(f"Error: Start height ({args.start_height}) must be less than end height ({args.end_height})")
         return 1
     
-    # 輸出基本資訊
-    safe_print(f"=== Web Screenshot Tool v2.2.0 ===")
-    safe_print(f"Target URL: {args.url}")
-    safe_print(f"Output file: {args.output}")
-    safe_print(f"Window size: {args.width} x {args.height}")
+    # 輸出基本資訊：組成一個字串一次寫出，平行截圖時也不會與其他輸出交錯
+    banner = [BANNER]
+    for url, output_path in zip(urls, outputs):
+        banner.append(f"Target URL: {url}")
+        banner.append(f"Output file: {output_path}")
+    if len(urls) > 1:
+        banner.append(f"Parallel jobs: {min(args.jobs, len(urls))}")
+        if args.tabs:
+            banner.append("Tabs: Enabled (URLs load concurrently in one browser)")
+    banner.append(f"Window size: {args.width} x {args.height}")
     
     # 顯示截圖模式
-    if args.end_height is not None:
-        safe_print(f"Screenshot mode: Range ({args.start_height}px → {args.end_height}px)")
+    if args.element:
+        banner.append(f"Screenshot mode: Element ({args.element})")
+    elif args.end_height is not None:
+        banner.append(f"Screenshot mode: Range ({args.start_height}px → {args.end_height}px)")
     elif args.no_full_page:
-        safe_print("Screenshot mode: Viewport")
+        banner.append("Screenshot mode: Viewport")
     else:
-        safe_print("Screenshot mode: Full page")
+        banner.append("Screenshot mode: Full page")
     
-    safe_print(f"Wait time: {args.wait} seconds")
+    if args.preset:
+        banner.append(f"Preset: {args.preset} ({round(args.width * args.dpi)} x {round(args.height * args.dpi)} output)")
+    elif args.dpi != 1.0:
+        banner.append(f"DPI scale: {args.dpi}")
+    
+    if args.no_images:
+        banner.append("Images: Disabled")
+    
+    banner.append(f"Wait time: up to {args.wait} seconds")
+    if args.settle > 0:
+        banner.append(f"Settle time: {args.settle} seconds")
     
     if args.username:
-        safe_print(f"Username: {args.username}")
-        safe_print("Authentication: Enabled (Auto-detect mode)")
+        banner.append(f"Username: {args.username}")
+        banner.append("Authentication: Enabled (Auto-detect mode)")
     
-    safe_print("-" * 60)
+    banner.append(SEPARATOR)
+    log.info("\n".join(banner))
     
-    # 執行截圖
-    success = tool.capture_screenshot(
-        url=args.url,
-        output_path=args.output,
+    options = dict(
         width=args.width,
         height=args.height,
         full_page=not args.no_full_page,
@@ -939,15 +2147,64 @@ def main():
         username=args.username,
         password=args.password,
         start_height=args.start_height,
-        end_height=args.end_height
+        end_height=args.end_height,
+        dpi=args.dpi,
+        element=args.element,
+        settle_time=args.settle
     )
     
-    if success:
-        safe_print("Screenshot completed successfully!")
+    jobs = [dict(options, url=url, output_path=output_path) for url, output_path in zip(urls, outputs)]
+    
+    # 執行截圖
+    if args.connect:
+        log.info(f"Sending job to daemon: {args.connect}")
+        results = []
+        for job in jobs:
+            job['output_path'] = os.path.abspath(job['output_path'])
+            try:
+                results.append(send_job(args.connect, job))
+            except Exception as e:
+                log.error(f"Error: Unable to reach daemon at {args.connect}: {e}")
+                results.append(False)
+    elif args.tabs and len(jobs) > 1:
+        # 所有 URL 以分頁同時載入，頁面載入在同一個 Chrome 內重疊；--jobs 決定分給幾個 Chrome
+        tool = WebScreenshotTool(**tool_kwargs)
+        results = tool.capture_many(list(zip(urls, outputs)), parallelism=args.jobs, **options)
+    elif args.jobs > 1 and len(jobs) > 1:
+        # 每個程序各自啟動 ChromeDriver，瀏覽器啟動與頁面載入在多個程序間重疊
+        # 工作程序的日誌經由佇列交給主程序的 handler 輸出，不會彼此爭用 stdout
+        results = []
+        log_queue = multiprocessing.Queue()
+        listener = logging.handlers.QueueListener(log_queue, *log.handlers)
+        listener.start()
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs)), initializer=_init_worker,
+                                                        initargs=(tool_kwargs, log_queue, log_level)) as pool:
+                futures = [pool.submit(_run_worker_job, job) for job in jobs]
+                for job, future in zip(jobs, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        log.error(f"Screenshot failed for {job['url']}: {e}", exc_info=args.debug)
+                        results.append(False)
+        finally:
+            listener.stop()
+    else:
+        # 依序截圖，共用同一個快取的 Chrome
+        tool = WebScreenshotTool(**tool_kwargs)
+        results = [tool.capture_screenshot(**job) for job in jobs]
+    
+    if all(results):
+        log.info("Screenshot completed successfully!")
         return 0
     else:
-        safe_print("Screenshot failed!")
+        if len(results) > 1:
+            log.error(f"Screenshot failed! ({results.count(False)} of {len(results)} failed)")
+        else:
+            log.error("Screenshot failed!")
         return 1
 
 if __name__ == "__main__":
+    # PyInstaller --onefile 的 Windows 執行檔：--jobs 的工作程序會重新執行此檔，需先交給 multiprocessing 處理
+    multiprocessing.freeze_support()
     sys.exit(main())